@@ -0,0 +1,222 @@
+import math
+import platform
+import statistics
+import time
+
+import django
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from recipes.models import (Follow, Ingredient, Recipe, RecipeIngredientQty,
+                            Shopping, Tag)
+from rest_framework.test import APIClient
+from users.models import User
+
+from .ingredient_index import reset_ingredient_index
+from .querylog import QueryLog
+from .rendered_cache import rendered_cache
+
+BENCHMARK_IMAGE = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAP///wAAACwAAAAAAQABAAACAkQBADs='
+)
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Scenario:
+
+    def __init__(self, name, method, url, user=None, data=None,
+                 writes=False):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.user = user
+        self.data = data
+        self.writes = writes
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)]
+
+
+def recipe_body(recipe):
+    return {
+        'name': f'{recipe.name} (бенчмарк)',
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': list(recipe.tags.values_list('id', flat=True)),
+        'ingredients': [
+            {'id': ingredient_id, 'amount': amount + 1}
+            for ingredient_id, amount in recipe.recipeingredientqty_set
+            .values_list('ingredient_id', 'amount')
+        ],
+    }
+
+
+def build_scenarios():
+    recipe = Recipe.objects.annotate(
+        total=Count('recipeingredientqty')
+    ).order_by('-total', 'id').select_related('author').first()
+    shopper = User.objects.annotate(
+        total=Count('shopping_cards')
+    ).order_by('-total', 'id').first()
+    follower = Follow.objects.values('user').annotate(
+        total=Count('id')
+    ).order_by('-total', 'user').first()
+    if recipe is None or shopper is None or follower is None:
+        return None
+    follower = User.objects.get(pk=follower['user'])
+    tag = Tag.objects.order_by('id').first()
+    ingredient = Ingredient.objects.order_by('id').first()
+    body = recipe_body(recipe)
+    return [
+        Scenario('recipes_list_anonymous', 'get', '/api/recipes/?limit=6'),
+        Scenario(
+            'recipes_list', 'get', '/api/recipes/?limit=6', user=shopper
+        ),
+        Scenario(
+            'recipes_list_filtered', 'get',
+            f'/api/recipes/?limit=6&tags={tag.slug}&is_favorited=1',
+            user=shopper
+        ),
+        Scenario(
+            'recipe_retrieve', 'get', f'/api/recipes/{recipe.id}/',
+            user=shopper
+        ),
+        Scenario(
+            'download_shopping_cart', 'get',
+            '/api/recipes/download_shopping_cart/?format=txt', user=shopper
+        ),
+        Scenario(
+            'subscriptions', 'get',
+            '/api/users/subscriptions/?recipes_limit=3', user=follower
+        ),
+        Scenario(
+            'ingredients_search', 'get',
+            f'/api/ingredients/?name={ingredient.name[:2]}'
+        ),
+        Scenario(
+            'recipe_create', 'post', '/api/recipes/', user=recipe.author,
+            data=dict(body, image=BENCHMARK_IMAGE), writes=True
+        ),
+        Scenario(
+            'recipe_update', 'patch', f'/api/recipes/{recipe.id}/',
+            user=recipe.author, data=body, writes=True
+        ),
+    ]
+
+
+def clear_caches():
+    cache.clear()
+    rendered_cache.clear()
+    reset_ingredient_index()
+
+
+def run_commit_hooks(start):
+    while len(connection.run_on_commit) > start:
+        hooks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, hook in hooks:
+            hook()
+
+
+def request_once(client, scenario):
+    hooks = len(connection.run_on_commit)
+    with QueryLog(keep=0).capture() as log:
+        started = time.perf_counter()
+        if scenario.data is None:
+            response = getattr(client, scenario.method)(scenario.url)
+        else:
+            response = getattr(client, scenario.method)(
+                scenario.url, data=scenario.data, format='json'
+            )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        if scenario.writes:
+            run_commit_hooks(hooks)
+        elapsed = time.perf_counter() - started
+    return (
+        response.status_code,
+        elapsed * 1000,
+        log.count,
+        log.seconds * 1000,
+    )
+
+
+def run_scenario(scenario, iterations, warmup, cold=False):
+    client = APIClient()
+    if scenario.user is not None:
+        client.force_authenticate(scenario.user)
+    samples = []
+    for i in range(warmup + iterations):
+        if cold:
+            clear_caches()
+        with transaction.atomic():
+            sample = request_once(client, scenario)
+            if scenario.writes:
+                transaction.set_rollback(True)
+        if i >= warmup:
+            samples.append(sample)
+    statuses, wall, queries, sql = zip(*samples)
+    result = {
+        'status': sorted(set(statuses)),
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(wall), 3),
+        'max_ms': round(max(wall), 3),
+        'queries': statistics.median_low(queries),
+        'sql_ms': round(statistics.median(sql), 3),
+    }
+    for rank in PERCENTILES:
+        result[f'p{rank}_ms'] = round(percentile(wall, rank), 3)
+    return result
+
+
+def dataset_sizes():
+    return {
+        'users': User.objects.count(),
+        'recipes': Recipe.objects.count(),
+        'recipe_ingredients': RecipeIngredientQty.objects.count(),
+        'carts': Shopping.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def run_benchmarks(scenarios, iterations, warmup, cold=False):
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'cold': cold,
+            'dataset': dataset_sizes(),
+        },
+        'results': {
+            scenario.name: run_scenario(scenario, iterations, warmup, cold)
+            for scenario in scenarios
+        },
+    }
+
+
+def compare(results, baseline, threshold, metrics=('p50_ms', 'p95_ms')):
+    regressions = []
+    for name, result in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric in metrics:
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    (name, metric, base[metric], result[metric])
+                )
+        if result['queries'] > base['queries']:
+            regressions.append(
+                (name, 'queries', base['queries'], result['queries'])
+            )
+    return regressions
@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.db.models import Exists, OuterRef, Value
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from recipes.models import Follow, Recipe
+from recipes.versions import get_versions
+
+
+def make_etag(*parts):
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def accepts_gzip(request):
+    qualities = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def request_versions(request, *names):
+    if not hasattr(request, 'data_versions'):
+        request.data_versions = {}
+    missing = [name for name in names if name not in request.data_versions]
+    if missing:
+        request.data_versions.update(get_versions(*missing))
+    return [request.data_versions[name] for name in names]
+
+
+def version_timestamp(versions):
+    return datetime.fromtimestamp(
+        max(int(version) for version in versions) / 10 ** 9,
+        tz=timezone.utc
+    )
+
+
+def version_condition(*names):
+    def etag(request, *args, **kwargs):
+        return make_etag(
+            *request_versions(request, *names),
+            request.accepted_media_type,
+            request.get_full_path(),
+            'gzip' if accepts_gzip(request) else 'identity',
+        )
+
+    def last_modified(request, *args, **kwargs):
+        return version_timestamp(request_versions(request, *names))
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+    return lambda view: vary_on_headers('Accept-Encoding')(conditional(view))
+
+
+def recipe_state(request, pk):
+    if not str(pk).isdigit():
+        return None
+    if not hasattr(request, 'recipe_state'):
+        user = request.user
+        recipes = Recipe.objects.filter(pk=pk).with_user_flags(user)
+        if user.is_anonymous:
+            recipes = recipes.annotate(is_author_subscribed=Value(False))
+        else:
+            recipes = recipes.annotate(is_author_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('author'))
+            ))
+        request.recipe_state = recipes.values_list(
+            'updated_at',
+            'author__updated_at',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'is_author_subscribed',
+        ).first()
+    return request.recipe_state
+
+
+def recipe_etag(request, pk=None):
+    state = recipe_state(request, pk)
+    if state is None:
+        return None
+    return make_etag(
+        *state,
+        *request_versions(request, 'tags', 'ingredients'),
+        request.accepted_media_type,
+    )
+
+
+def recipe_last_modified(request, pk=None):
+    state = recipe_state(request, pk)
+    if state is None or not request.user.is_anonymous:
+        return None
+    return max(*state[:2], version_timestamp(
+        request_versions(request, 'tags', 'ingredients')
+    ))
+
+
+recipe_condition = condition(
+    etag_func=recipe_etag, last_modified_func=recipe_last_modified
+)
@@ -1,23 +1,110 @@
 import base64
-import imghdr
+import binascii
 import uuid
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile,
+                                            UploadedFile)
+from PIL import Image
+from recipes.images import IMAGE_VARIANTS, variants_ready
 from rest_framework import fields
 
+DECODE_CHUNK_SIZE = 64 * 1024 * 4
+
+
+class DecodedTemporaryFile(TemporaryUploadedFile):
+
+    def __del__(self):
+        self.close()
+
 
 class DecodeImageField(fields.ImageField):
+    default_error_messages = {
+        'too_large': 'Размер изображения превышает {max_bytes} байт.',
+        'too_many_pixels': (
+            'Изображение больше допустимых {max_pixels} пикселей.'
+        ),
+    }
 
     def to_internal_value(self, data):
-        header, data = data.split(';base64,')
-        decoded_file = base64.b64decode(data)
-        file_name = str(uuid.uuid4())[:10]
-        file_extension = self.get_file_extension(file_name, decoded_file)
-        complete_file_name = f'{file_name}.{file_extension}'
-        data = ContentFile(decoded_file, name=complete_file_name)
+        decoded = isinstance(data, str)
+        if decoded:
+            data = self.decode(data)
+        elif not isinstance(data, UploadedFile):
+            self.fail('invalid')
+        if data.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES)
+        file_extension = self.check_image(data)
+        if decoded:
+            data.name = f'{data.name}.{file_extension}'
         return super(DecodeImageField, self).to_internal_value(data)
 
-    def get_file_extension(self, file_name, decoded_file):
-        extension = imghdr.what(file_name, decoded_file)
+    def decode(self, data):
+        header, _, data = data.partition(';base64,')
+        if not data:
+            self.fail('invalid_image')
+        size = len(data) // 4 * 3
+        if size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES)
+        file_name = str(uuid.uuid4())[:10]
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            decoded_file = DecodedTemporaryFile(file_name, None, size, None)
+        else:
+            decoded_file = InMemoryUploadedFile(
+                BytesIO(), None, file_name, None, size, None
+            )
+        try:
+            for start in range(0, len(data), DECODE_CHUNK_SIZE):
+                decoded_file.write(base64.b64decode(
+                    data[start:start + DECODE_CHUNK_SIZE]
+                ))
+        except binascii.Error:
+            self.fail('invalid_image')
+        decoded_file.size = decoded_file.tell()
+        decoded_file.seek(0)
+        return decoded_file
+
+    def check_image(self, image_file):
+        try:
+            image = Image.open(image_file)
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            image_file.seek(0)
+        width, height = image.size
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels',
+                max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS
+            )
+        extension = image.format.lower()
         extension = 'jpg' if extension == 'jpeg' else extension
         return extension
+
+
+class ImageVariantsField(fields.Field):
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        variants = recipe.image_variants if variants_ready(recipe) else {}
+        request = self.context.get('request')
+        urls = {}
+        for variant in IMAGE_VARIANTS:
+            url = (
+                default_storage.url(variants[variant])
+                if variant in variants else recipe.image.url
+            )
+            urls[variant] = (
+                request.build_absolute_uri(url) if request is not None
+                else url
+            )
+        return urls
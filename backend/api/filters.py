@@ -1,16 +1,9 @@
 from django_filters import rest_framework as filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 from users.models import User
 
 
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
-
-
 class RecipeFilter(filters.FilterSet):
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all()
@@ -24,10 +17,13 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
 
     def get_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
@@ -38,3 +34,6 @@ class RecipeFilter(filters.FilterSet):
         if value and not self.request.user.is_anonymous:
             return queryset.filter(shopping_cards__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count
+from recipes.models import Ingredient
+from recipes.versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSIONS = ('ingredients',)
+
+_lock = threading.Lock()
+_index = None
+
+
+class IngredientIndex:
+
+    def __init__(self, version, ingredients):
+        self.version = version
+        self.items = sorted(
+            ingredients, key=lambda item: (item['key'], -item['uses'])
+        )
+        self.keys = [item['key'] for item in self.items]
+
+    @staticmethod
+    def rank(item):
+        return -item['uses'], item['key']
+
+    def search(self, query, limit=None):
+        query = query.lower()
+        start = bisect_left(self.keys, query)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(query):
+            end += 1
+        found = sorted(self.items[start:end], key=self.rank)
+        if limit is None or len(found) < limit:
+            found += sorted(
+                (
+                    item for item in self.items[:start] + self.items[end:]
+                    if query in item['key']
+                ),
+                key=self.rank
+            )
+        return [item['data'] for item in found[:limit]]
+
+
+def build_index(version):
+    ingredients = Ingredient.objects.annotate(
+        uses=Count('recipeingredientqty')
+    ).values_list('id', 'name', 'measurement_unit', 'uses')
+    return IngredientIndex(version, [
+        {
+            'key': name.lower(),
+            'uses': uses,
+            'data': {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            },
+        }
+        for pk, name, measurement_unit, uses in ingredients
+    ])
+
+
+def ranking_epoch():
+    return int(time.time()) // settings.INGREDIENT_RANKING_TTL
+
+
+def get_ingredient_index(versions=None):
+    global _index
+    if versions is None:
+        versions = tuple(get_versions(*INDEX_VERSIONS).values())
+    version = (*versions, ranking_epoch())
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = build_index(version)
+            index = _index
+    return index
+
+
+def reset_ingredient_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+def warm_ingredient_index():
+    try:
+        get_ingredient_index()
+    except DatabaseError:
+        logger.warning(
+            'Не удалось построить индекс ингредиентов', exc_info=True
+        )
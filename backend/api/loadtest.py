@@ -0,0 +1,357 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from .benchmarks import BENCHMARK_IMAGE, PERCENTILES, percentile
+
+LOGIN_URL = '/api/auth/token/login/'
+LIST_PAGES = 5
+PAGE_LIMIT = 6
+CREATE_INGREDIENTS = 5
+REQUEST_TIMEOUT = 30
+TOGGLE_STATUSES = {'post': (201, 400), 'delete': (204, 400)}
+
+
+class HTTPConnection:
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        for attempt in range(2):
+            fresh = self.writer is None
+            if fresh:
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.host, self.port
+                )
+            try:
+                return await self.exchange(method, path, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if fresh or attempt:
+                    raise
+
+    async def exchange(self, method, path, headers, body):
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Content-Length: {len(body)}',
+            *(f'{name}: {value}' for name, value in headers.items()),
+        ]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Сервер закрыл соединение')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, value = line.split(':', 1)
+            response_headers[name.lower()] = value.strip()
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = await self.read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(
+                int(response_headers['content-length'])
+            )
+        else:
+            content = await self.reader.read()
+            await self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, content
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if not size:
+                while (await self.reader.readline()).strip():
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, endpoint, elapsed, error=None):
+        self.latencies[endpoint].append(elapsed * 1000)
+        if error is not None:
+            self.errors[endpoint][error] += 1
+
+    def report(self, duration):
+        report = {}
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            errors = sum(self.errors[endpoint].values())
+            report[endpoint] = {
+                'requests': len(latencies),
+                'rps': round(len(latencies) / duration, 2),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4),
+                'error_kinds': dict(self.errors[endpoint]),
+                **{
+                    f'p{rank}_ms': round(percentile(latencies, rank), 2)
+                    for rank in PERCENTILES
+                },
+            }
+        return report
+
+
+class VirtualUser:
+
+    def __init__(self, runner, email, rng):
+        self.runner = runner
+        self.email = email
+        self.rng = rng
+        self.connection = HTTPConnection(runner.base_url)
+        self.token = None
+        self.favorites = set()
+        self.cart = set()
+
+    async def call(self, method, path, endpoint, body=None, ok=(200,),
+                   params=None):
+        headers = {'Accept': 'application/json'}
+        if self.token is not None:
+            headers['Authorization'] = f'Token {self.token}'
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body).encode()
+        if params:
+            path = f'{path}?{urlencode(params, doseq=True)}'
+        started = time.perf_counter()
+        try:
+            status, content = await asyncio.wait_for(
+                self.connection.request(
+                    method.upper(), path, headers, body or b''
+                ),
+                REQUEST_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError) as error:
+            await self.connection.close()
+            self.runner.stats.record(
+                endpoint, time.perf_counter() - started,
+                type(error).__name__
+            )
+            return None, None
+        self.runner.stats.record(
+            endpoint, time.perf_counter() - started,
+            None if status in ok else str(status)
+        )
+        return status, content
+
+    async def login(self):
+        status, content = await self.call(
+            'post', LOGIN_URL, f'POST {LOGIN_URL}',
+            body={'email': self.email, 'password': self.runner.password}
+        )
+        if status == 200:
+            self.token = json.loads(content)['auth_token']
+        return self.token is not None
+
+    def pick_recipe(self):
+        if not self.runner.recipe_ids:
+            return None
+        return self.rng.choice(self.runner.recipe_ids)
+
+    async def browse(self, params=None):
+        params = dict(
+            params or {},
+            page=self.rng.randint(1, LIST_PAGES),
+            limit=PAGE_LIMIT
+        )
+        status, content = await self.call(
+            'get', '/api/recipes/',
+            'GET /api/recipes/?tags' if 'tags' in params
+            else 'GET /api/recipes/',
+            params=params
+        )
+        if status == 200:
+            self.runner.remember(
+                recipe['id'] for recipe in json.loads(content)['results']
+            )
+
+    async def browse_tags(self):
+        tags = self.runner.tags
+        await self.browse({
+            'tags': self.rng.sample(tags, self.rng.randint(1, len(tags)))
+        })
+
+    async def detail(self):
+        recipe_id = self.pick_recipe()
+        if recipe_id is not None:
+            await self.call(
+                'get', f'/api/recipes/{recipe_id}/', 'GET /api/recipes/{id}/'
+            )
+
+    async def toggle(self, action, chosen):
+        recipe_id = self.pick_recipe()
+        if recipe_id is None:
+            return
+        method = 'delete' if recipe_id in chosen else 'post'
+        status, _ = await self.call(
+            method, f'/api/recipes/{recipe_id}/{action}/',
+            f'{method.upper()} /api/recipes/{{id}}/{action}/',
+            ok=TOGGLE_STATUSES[method]
+        )
+        if status in TOGGLE_STATUSES[method]:
+            chosen.symmetric_difference_update({recipe_id})
+
+    async def favorite(self):
+        await self.toggle('favorite', self.favorites)
+
+    async def cart_toggle(self):
+        await self.toggle('shopping_cart', self.cart)
+
+    async def download(self):
+        await self.call(
+            'get', '/api/recipes/download_shopping_cart/',
+            'GET /api/recipes/download_shopping_cart/'
+        )
+
+    async def create(self):
+        ingredients = self.rng.sample(
+            self.runner.ingredients,
+            min(CREATE_INGREDIENTS, len(self.runner.ingredients))
+        )
+        status, content = await self.call(
+            'post', '/api/recipes/', 'POST /api/recipes/', ok=(201,),
+            body={
+                'name': f'Нагрузка {uuid.uuid4().hex[:12]}',
+                'text': 'Рецепт из нагрузочного теста',
+                'cooking_time': self.rng.randint(5, 120),
+                'image': BENCHMARK_IMAGE,
+                'tags': [self.rng.choice(self.runner.tag_ids)],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': self.rng.randint(1, 500)}
+                    for ingredient_id in ingredients
+                ],
+            }
+        )
+        if status == 201:
+            self.runner.remember([json.loads(content)['id']])
+
+    async def run(self, deadline):
+        actions = {
+            'browse': self.browse,
+            'browse_tags': self.browse_tags,
+            'detail': self.detail,
+            'favorite': self.favorite,
+            'cart': self.cart_toggle,
+            'download': self.download,
+            'create': self.create,
+        }
+        names = list(self.runner.mix)
+        weights = [self.runner.mix[name] for name in names]
+        while time.monotonic() < deadline:
+            await actions[self.rng.choices(names, weights)[0]]()
+            if self.runner.think_time:
+                await asyncio.sleep(
+                    self.rng.uniform(0, 2 * self.runner.think_time)
+                )
+        await self.connection.close()
+
+
+class LoadTest:
+
+    def __init__(self, scenario):
+        self.base_url = scenario['base_url'].rstrip('/')
+        self.duration = scenario['duration']
+        self.concurrency = scenario['concurrency']
+        self.think_time = scenario.get('think_time', 0)
+        self.mix = {
+            name: weight for name, weight in scenario['mix'].items()
+            if weight > 0
+        }
+        self.prefix = scenario['users']['prefix']
+        self.user_count = scenario['users']['count']
+        self.password = scenario['users']['password']
+        self.rng = random.Random(scenario.get('seed'))
+        self.stats = Stats()
+        self.recipe_ids = []
+        self.known_recipes = set()
+        self.tags = self.tag_ids = self.ingredients = None
+
+    def remember(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            if recipe_id not in self.known_recipes:
+                self.known_recipes.add(recipe_id)
+                self.recipe_ids.append(recipe_id)
+
+    async def fetch_catalog(self, user, path):
+        status, content = await user.call('get', path, f'GET {path}')
+        if status != 200:
+            raise RuntimeError(
+                f'{self.base_url}{path} не отвечает: '
+                f'{dict(self.stats.errors[f"GET {path}"])}'
+            )
+        return json.loads(content)
+
+    async def bootstrap(self, user):
+        tags = await self.fetch_catalog(user, '/api/tags/')
+        self.tags = [tag['slug'] for tag in tags]
+        self.tag_ids = [tag['id'] for tag in tags]
+        self.ingredients = [
+            ingredient['id']
+            for ingredient in await self.fetch_catalog(
+                user, '/api/ingredients/'
+            )
+        ]
+        await user.browse()
+        if not self.tags or not self.ingredients or not self.recipe_ids:
+            raise RuntimeError(
+                'На сервере нет тегов, ингредиентов или рецептов'
+            )
+
+    async def run(self):
+        users = [
+            VirtualUser(
+                self,
+                f'{self.prefix}{number}@example.com',
+                random.Random(self.rng.random())
+            )
+            for number in self.rng.sample(
+                range(self.user_count),
+                min(self.concurrency, self.user_count)
+            )
+        ]
+        await self.bootstrap(users[0])
+        logged_in = await asyncio.gather(*(user.login() for user in users))
+        users = [user for user, ok in zip(users, logged_in) if ok]
+        if not users:
+            raise RuntimeError('Ни один пользователь не вошёл в систему')
+        started = time.monotonic()
+        await asyncio.gather(
+            *(user.run(started + self.duration) for user in users)
+        )
+        elapsed = time.monotonic() - started
+        return {
+            'meta': {
+                'base_url': self.base_url,
+                'duration_s': round(elapsed, 2),
+                'concurrency': len(users),
+                'mix': self.mix,
+            },
+            'results': self.stats.report(elapsed),
+        }
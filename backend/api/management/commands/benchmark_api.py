@@ -0,0 +1,114 @@
+import json
+import shutil
+import sys
+import tempfile
+
+from api.benchmarks import build_scenarios, compare, run_benchmarks
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+COLD_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число SQL-запросов основных эндпоинтов '
+        'API и сравнивает результат с сохранённым эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--only', action='append',
+            help='Запустить только указанный сценарий'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help=(
+                'Сбрасывать перед каждым запросом общий кэш, кэш '
+                'отрендеренных списков и индекс ингредиентов'
+            )
+        )
+        parser.add_argument(
+            '--output', type=str,
+            help='Сохранить результаты в JSON'
+        )
+        parser.add_argument(
+            '--baseline', type=str,
+            help='JSON с эталонными результатами для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое ухудшение задержки, доля (0.2 = 20%%)'
+        )
+
+    def handle(self, *args, **kwargs):
+        scenarios = build_scenarios()
+        if scenarios is None:
+            raise CommandError(
+                'В базе нет данных для замеров, запустите generate_dataset'
+            )
+        if kwargs['only']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if scenario.name in kwargs['only']
+            ]
+        media_root = tempfile.mkdtemp()
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'MEDIA_ROOT': media_root,
+            'REQUEST_TIMING_ENABLED': False,
+        }
+        if kwargs['cold']:
+            overrides['CACHES'] = COLD_CACHES
+        try:
+            with override_settings(**overrides):
+                results = run_benchmarks(
+                    scenarios, kwargs['iterations'], kwargs['warmup'],
+                    kwargs['cold']
+                )
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        self.report(results)
+        if kwargs['output']:
+            self.save(results, kwargs['output'])
+        if kwargs['baseline']:
+            self.compare(results, kwargs['baseline'], kwargs['threshold'])
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"сценарий":<26} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"запросы":>8} {"SQL мс":>8}  статус'
+        )
+        for name, result in results['results'].items():
+            self.stdout.write(
+                f'{name:<26} {result["p50_ms"]:>8.2f} '
+                f'{result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                f'{result["queries"]:>8} {result["sql_ms"]:>8.2f}  '
+                f'{",".join(map(str, result["status"]))}'
+            )
+
+    def save(self, results, path):
+        if path == '-':
+            json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+            return
+        with open(path, 'wt', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def compare(self, results, path, threshold):
+        with open(path, 'rt', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, threshold)
+        for name, metric, before, after in regressions:
+            self.stdout.write(
+                f'РЕГРЕССИЯ {name} {metric}: {before} -> {after}'
+            )
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write('Регрессий относительно эталона нет')
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+
+from api.loadtest import LoadTest
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+DEFAULT_SCENARIO = os.path.join(settings.BASE_DIR, 'data', 'loadtest.json')
+SCENARIO_OVERRIDES = ('base_url', 'duration', 'concurrency', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер смесью запросов из файла сценария '
+        'и выводит пропускную способность, задержки и ошибки '
+        'по каждому эндпоинту'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', type=str, default=DEFAULT_SCENARIO)
+        parser.add_argument('--base-url', type=str)
+        parser.add_argument('--duration', type=int)
+        parser.add_argument('--concurrency', type=int)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--users', type=int,
+            help='Сколько пользователей создал generate_dataset'
+        )
+        parser.add_argument(
+            '--output', type=str,
+            help='Сохранить результаты в JSON'
+        )
+
+    def handle(self, *args, **kwargs):
+        with open(kwargs['scenario'], 'rt', encoding='utf-8') as f:
+            scenario = json.load(f)
+        for name in SCENARIO_OVERRIDES:
+            if kwargs[name] is not None:
+                scenario[name] = kwargs[name]
+        if kwargs['users'] is not None:
+            scenario['users']['count'] = kwargs['users']
+        try:
+            results = asyncio.run(LoadTest(scenario).run())
+        except (OSError, RuntimeError) as error:
+            raise CommandError(error)
+        meta = results['meta']
+        self.stdout.write(
+            f'{meta["base_url"]}: {meta["concurrency"]} пользователей, '
+            f'{meta["duration_s"]} с'
+        )
+        self.stdout.write(
+            f'{"эндпоинт":<48} {"запросы":>8} {"rps":>8} {"p50":>8} '
+            f'{"p95":>8} {"p99":>8} {"ошибки":>8}'
+        )
+        for endpoint, result in results['results'].items():
+            self.stdout.write(
+                f'{endpoint:<48} {result["requests"]:>8} '
+                f'{result["rps"]:>8.2f} {result["p50_ms"]:>8.2f} '
+                f'{result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                f'{result["error_rate"]:>8.2%}'
+            )
+            for kind, count in result['error_kinds'].items():
+                self.stdout.write(f'    {kind}: {count}')
+        if kwargs['output']:
+            with open(kwargs['output'], 'wt', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,97 @@
+import json
+import os
+
+from api.slow_queries import normalize
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+SORT_KEYS = ('total_ms', 'max_ms', 'count')
+
+
+def read_captures(path):
+    for name in (f'{path}.1', path):
+        if not os.path.exists(name):
+            continue
+        with open(name, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def aggregate(captures):
+    groups = {}
+    for capture in captures:
+        group = groups.setdefault(capture['fingerprint'], {
+            'fingerprint': capture['fingerprint'],
+            'statement': normalize(capture['sql']),
+            'count': 0,
+            'total_ms': 0,
+            'max_ms': 0,
+            'views': set(),
+            'worst': capture,
+        })
+        group['count'] += 1
+        group['total_ms'] += capture['ms']
+        group['views'].add(capture['view'])
+        if capture['ms'] >= group['max_ms']:
+            group['max_ms'] = capture['ms']
+            group['worst'] = capture
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = (
+        'Группирует перехваченные медленные запросы по отпечатку и '
+        'выводит их число, суммарное и худшее время'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default=None)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='total_ms',
+            help='Поле для сортировки групп'
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Показать план худшего выполнения каждой группы'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Вывести отчёт в JSON'
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path'] or settings.SLOW_QUERY_LOG
+        groups = sorted(
+            aggregate(read_captures(path)),
+            key=lambda group: group[kwargs['sort']],
+            reverse=True
+        )[:kwargs['limit']]
+        if not groups:
+            raise CommandError(f'В {path} нет перехваченных запросов')
+        if kwargs['json']:
+            for group in groups:
+                group['views'] = sorted(group['views'])
+                group['total_ms'] = round(group['total_ms'], 2)
+            self.stdout.write(json.dumps(groups, ensure_ascii=False, indent=2))
+            return
+        for group in groups:
+            self.stdout.write(
+                f'{group["fingerprint"]}  раз: {group["count"]}  '
+                f'всего: {group["total_ms"]:.1f} мс  '
+                f'среднее: {group["total_ms"] / group["count"]:.1f} мс  '
+                f'худшее: {group["max_ms"]:.1f} мс  '
+                f'{", ".join(sorted(group["views"]))}'
+            )
+            self.stdout.write(f'    {group["statement"]}')
+            if kwargs['plans']:
+                worst = group['worst']
+                self.stdout.write(f'    параметры: {worst["params"]}')
+                self.stdout.write(
+                    '    ' + json.dumps(
+                        worst['plan'], ensure_ascii=False, indent=2
+                    ).replace('\n', '\n    ')
+                )
@@ -0,0 +1,115 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .querylog import QueryLog
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_SQL_LENGTH = 500
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTiming:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = self.view_finished = self.rendered = None
+        self.queries = QueryLog()
+
+    def mark_rendered(self, response):
+        self.rendered = time.perf_counter()
+
+    def segments(self, finished):
+        view_finished = self.view_finished or finished
+        return {
+            'total': finished - self.started,
+            'view': (
+                view_finished - self.view_started
+                if self.view_started else 0
+            ),
+            'render': (
+                self.rendered - self.view_finished
+                if self.rendered and self.view_finished else 0
+            ),
+            'db': self.queries.seconds,
+        }
+
+    def server_timing(self, finished):
+        segments = self.segments(finished)
+        return ', '.join(
+            f'{name};dur={milliseconds(seconds)}'
+            + (f';desc="{self.queries.count} SQL"' if name == 'db' else '')
+            for name, seconds in segments.items()
+        )
+
+    def record(self, request, response, finished):
+        slowest, sql = self.queries.slowest
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **{
+                f'{name}_ms': milliseconds(seconds)
+                for name, seconds in self.segments(finished).items()
+            },
+            'queries': self.queries.count,
+            'slowest_ms': milliseconds(slowest),
+            'slowest_sql': sql and sql[:SLOWEST_SQL_LENGTH],
+        }
+
+
+class RequestTimingMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming()
+        with timing.queries.capture():
+            response = self.get_response(request)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timing.server_timing(
+                time.perf_counter()
+            )
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, timing, response.streaming_content
+            )
+        else:
+            self.log(request, response, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.timing.view_finished = time.perf_counter()
+        response.add_post_render_callback(request.timing.mark_rendered)
+        return response
+
+    def stream(self, request, response, timing, content):
+        try:
+            with timing.queries.capture():
+                yield from content
+        finally:
+            self.log(request, response, timing)
+
+    def log(self, request, response, timing):
+        record = timing.record(request, response, time.perf_counter())
+        if record['total_ms'] < settings.SLOW_REQUEST_MS:
+            logger.info(json.dumps(record, ensure_ascii=False))
+            return
+        record['query_list'] = [
+            {'ms': milliseconds(seconds), 'sql': sql}
+            for seconds, sql in timing.queries.queries
+        ]
+        logger.warning(json.dumps(record, ensure_ascii=False))
@@ -1,5 +1,39 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-created_at', '-id')
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('id',)
+
+
+class CursorPaginationMixin:
+    cursor_pagination_class = None
+    cursor_excluded_params = ()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if (
+                self.cursor_pagination_class is not None
+                and self.cursor_pagination_class.cursor_query_param
+                in self.request.query_params
+                and not any(
+                    self.request.query_params.get(param)
+                    for param in self.cursor_excluded_params
+                )
+            ):
+                pagination_class = self.cursor_pagination_class
+            self._paginator = (
+                None if pagination_class is None else pagination_class()
+            )
+        return self._paginator
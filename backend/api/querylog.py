@@ -0,0 +1,41 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+SKIPPED_PREFIXES = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO', 'EXPLAIN',
+)
+MAX_LOGGED_QUERIES = 1000
+
+
+class QueryLog:
+
+    def __init__(self, keep=MAX_LOGGED_QUERIES):
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0
+        self.slowest = (0, None)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(SKIPPED_PREFIXES):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if elapsed > self.slowest[0]:
+                self.slowest = (elapsed, sql)
+            if len(self.queries) < self.keep:
+                self.queries.append((elapsed, sql))
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
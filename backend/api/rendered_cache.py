@@ -0,0 +1,81 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .conditional import accepts_gzip, request_versions
+
+RENDERED_CACHE_MAX_ENTRIES = 256
+
+
+class RenderedCache:
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+rendered_cache = RenderedCache(RENDERED_CACHE_MAX_ENTRIES)
+
+
+class RenderedListMixin:
+    rendered_versions = ()
+
+    def list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def rendered_params(self, request):
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        params = self.rendered_params(request)
+        if request.accepted_renderer.format != 'json' or params is None:
+            return self.list_response(request, *args, **kwargs)
+        key = (
+            type(self).__name__,
+            *request_versions(request, *self.rendered_versions),
+            *params,
+        )
+        entry = rendered_cache.get(key)
+        if entry is None:
+            response = self.list_response(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            entry = (body, gzip.compress(body))
+            rendered_cache.set(key, entry)
+        body, compressed = entry
+        use_gzip = accepts_gzip(request)
+        response = HttpResponse(
+            compressed if use_gzip else body,
+            content_type=request.accepted_media_type
+        )
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,74 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .conditional import request_versions
+
+CACHED_LIST_PARAMS = (
+    'author',
+    'cursor',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'limit',
+    'page',
+    'search',
+    'tags',
+)
+LIST_CACHE_KEY = 'recipes:list:{}'
+LIST_CACHE_VERSIONS = ('recipes', 'tags', 'ingredients')
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+def list_cache_key(request):
+    params = sorted(
+        (name, sorted(set(request.query_params.getlist(name))))
+        for name in CACHED_LIST_PARAMS if name in request.query_params
+    )
+    versions = request_versions(request, *LIST_CACHE_VERSIONS)
+    return LIST_CACHE_KEY.format(hashlib.md5(
+        repr((request.get_host(), versions, params)).encode()
+    ).hexdigest())
+
+
+def single_flight(key, compute, timeout):
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, token, LOCK_TIMEOUT):
+        time.sleep(LOCK_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        if time.monotonic() > deadline:
+            token = None
+            break
+    try:
+        response = compute()
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+    finally:
+        if token is not None and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    return response
+
+
+class AnonymousListCacheMixin:
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        return single_flight(
+            list_cache_key(request),
+            lambda: super(AnonymousListCacheMixin, self).list(
+                request, *args, **kwargs
+            ),
+            settings.RECIPE_LIST_CACHE_TIMEOUT
+        )
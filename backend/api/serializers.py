@@ -1,21 +1,38 @@
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredientQty, Shopping, Tag)
+                            RecipeIngredientQty, Shopping, ShoppingListItem,
+                            Tag)
+from recipes.relations import explicit_side_effects
 from rest_framework import serializers
 from users.models import User
 
-from .fields import DecodeImageField
+from .fields import DecodeImageField, ImageVariantsField
 
 ERRORS = {
     'no_such_ingredient': 'Ингредиента с id {} нет в базе!',
+    'no_such_recipes': 'Рецептов с id {} нет в базе!',
+    'no_such_authors': 'Пользователей с id {} нет в базе!',
 }
 
 
+def existing_ids(model, ids, error):
+    ids = set(ids)
+    missing = ids - set(
+        model.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    if missing:
+        raise serializers.ValidationError(
+            ERRORS[error].format(', '.join(map(str, sorted(missing))))
+        )
+    return ids
+
+
 class RecipeSimpleSerializer(serializers.ModelSerializer):
 
     image = DecodeImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -23,6 +40,7 @@ class RecipeSimpleSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
@@ -43,8 +61,20 @@ class UserSerializer(UserCreateSerializer):
             'is_subscribed',
         )
 
+    def get_subscribed_ids(self):
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return set()
+        if not hasattr(request, 'subscribed_ids'):
+            request.subscribed_ids = set(
+                Follow.objects.filter(
+                    user=request.user
+                ).values_list('author_id', flat=True)
+            )
+        return request.subscribed_ids
+
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(author=obj).exists()
+        return obj.id in self.get_subscribed_ids()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -72,7 +102,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class RecipeIngredientQtySerializer(serializers.HyperlinkedModelSerializer):
 
-    id = serializers.IntegerField(required=False, source='ingredient.id')
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -109,11 +139,14 @@ class RecipeMainSerializer(RecipeSimpleSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is not None and not request.user.is_anonymous:
             current_user = request.user
@@ -123,6 +156,8 @@ class RecipeMainSerializer(RecipeSimpleSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is not None and not request.user.is_anonymous:
             current_user = request.user
@@ -143,59 +178,131 @@ class RecipeCreateSerializer(RecipeMainSerializer):
     )
 
     def validate(self, data):
-        ingredients_list = []
-        ingredients_data = data.get('recipeingredientqty_set')
-        for ingredient_data in ingredients_data:
-            ingredient = ingredient_data.get('ingredient')
-            try:
-                _ = get_object_or_404(
-                    Ingredient, pk=ingredient.get('id')
-                )
-            except Http404:
-                raise serializers.ValidationError(
-                    ERRORS.get('Ингредиент отсутствует в базе')
-                    .format(ingredient.get('id'))
-                )
-            if ingredient in ingredients_list:
-                raise serializers.ValidationError(
-                    'В рецепте дублируются ингредиенты')
-            ingredients_list.append(ingredient)
+        if 'recipeingredientqty_set' not in data:
+            return data
+        ingredient_ids = [
+            ingredient_data['ingredient']['id']
+            for ingredient_data in data['recipeingredientqty_set']
+        ]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'В рецепте дублируются ингредиенты')
+        existing_ids(Ingredient, ingredient_ids, 'no_such_ingredient')
         return data
 
-    def create_ingredients(self, ingredients_data, recipe):
+    @staticmethod
+    def ingredient_amounts(ingredients_data):
+        return {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+
+    def create_ingredients(self, amounts, recipe):
+        if not amounts:
+            return
         RecipeIngredientQty.objects.bulk_create(
-            [RecipeIngredientQty(
-                recipe=recipe,
-                ingredient=get_object_or_404(
-                    Ingredient, pk=ingredient_data.pop('ingredient').get('id')
-                ),
-                amount=ingredient_data.pop('amount')
-            ) for ingredient_data in ingredients_data]
+            [
+                RecipeIngredientQty(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in amounts.items()
+            ]
         )
 
-    def add_tags(self, recipe, tag_list):
-        for tag in tag_list:
-            recipe.tags.add(tag)
-        return recipe
+    def update_ingredients(self, amounts, recipe):
+        rows = {
+            row.ingredient_id: row
+            for row in recipe.recipeingredientqty_set.all()
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in rows.items()
+        }
+        if old_amounts == amounts:
+            return
+        removed = rows.keys() - amounts.keys()
+        if removed:
+            RecipeIngredientQty.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = [
+            rows[ingredient_id] for ingredient_id, amount in amounts.items()
+            if ingredient_id in rows and rows[ingredient_id].amount != amount
+        ]
+        for row in changed:
+            row.amount = amounts[row.ingredient_id]
+        RecipeIngredientQty.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in rows
+            },
+            recipe
+        )
+        ShoppingListItem.objects.change_recipe(recipe, old_amounts, amounts)
+
+    def update_tags(self, recipe, tag_list):
+        old_ids = set(recipe.tags.values_list('id', flat=True))
+        new_ids = {tag.id for tag in tag_list}
+        if old_ids - new_ids:
+            recipe.tags.remove(*(old_ids - new_ids))
+        if new_ids - old_ids:
+            recipe.tags.add(*(new_ids - old_ids))
 
     def create(self, validated_data):
         tag_list = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('recipeingredientqty_set')
+        amounts = self.ingredient_amounts(
+            validated_data.pop('recipeingredientqty_set')
+        )
         recipe = Recipe.objects.create(**validated_data)
-        self.add_tags(recipe, tag_list)
-        self.create_ingredients(ingredients_data, recipe)
+        recipe.tags.add(*tag_list)
+        self.create_ingredients(amounts, recipe)
         return recipe
 
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        if request is not None:
+            instance = Recipe.objects.with_related().with_user_flags(
+                request.user
+            ).get(pk=instance.pk)
+        return super().to_representation(instance)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tag_list = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('recipeingredientqty_set')
-        recipe = instance
-        recipe.tags.clear()
-        self.add_tags(recipe, tag_list)
-        RecipeIngredientQty.objects.filter(recipe=recipe).delete()
-        self.create_ingredients(ingredients_data, recipe)
-        super().update(recipe, validated_data)
-        return recipe
+        if 'tags' in validated_data:
+            self.update_tags(instance, validated_data.pop('tags'))
+        if 'recipeingredientqty_set' in validated_data:
+            amounts = self.ingredient_amounts(
+                validated_data.pop('recipeingredientqty_set')
+            )
+            with explicit_side_effects():
+                self.update_ingredients(amounts, instance)
+        super().update(instance, validated_data)
+        return instance
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_ITEMS
+    )
+
+    def validate_recipes(self, value):
+        return existing_ids(Recipe, value, 'no_such_recipes')
+
+
+class AuthorBatchSerializer(serializers.Serializer):
+
+    authors = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_ITEMS
+    )
+
+    def validate_authors(self, value):
+        return existing_ids(User, value, 'no_such_authors')
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -221,7 +328,7 @@ class FollowSerializer(UserSerializer):
     recipes = RecipeSimpleSerializer(
         many=True, read_only=True
     )
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -235,6 +342,3 @@ class FollowSerializer(UserSerializer):
             'recipes',
             'recipes_count',
         )
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
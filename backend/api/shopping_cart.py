@@ -0,0 +1,49 @@
+import csv
+import json
+
+INGREDIENT_POSITION_CART = '{} {} --- {} {}\n'
+SHOP_CART_HEADING = 'Список ингридиентов для похода в магазин\n\n'
+SHOP_CART_CSV_HEADER = ('Ингредиент', 'Ед. измерения', 'Количество')
+SHOPPING_FILENAME = 'shopping_cart.{}'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(rows):
+    yield SHOP_CART_HEADING
+    for i, (name, measurement_unit, amount) in enumerate(rows, 1):
+        yield INGREDIENT_POSITION_CART.format(
+            i, name, amount, measurement_unit
+        )
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOP_CART_CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    yield '['
+    for i, (name, measurement_unit, amount) in enumerate(rows):
+        yield (',' if i else '') + json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            },
+            ensure_ascii=False
+        )
+    yield ']'
+
+
+EXPORTERS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+}
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_SQL = {
+    'postgresql': 'EXPLAIN (FORMAT JSON) {}',
+    'sqlite': 'EXPLAIN QUERY PLAN {}',
+}
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    template = EXPLAIN_SQL.get(connection.vendor)
+    if template is None:
+        return None
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(template.format(sql), params)
+            rows = cursor.fetchall()
+    if connection.vendor == 'postgresql':
+        plan = rows[0][0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    return [row[-1] for row in rows]
+
+
+class SlowQueryCapture:
+
+    def __init__(self, request, connection):
+        self.request = request
+        self.connection = connection
+        self.slow = []
+
+    def view_name(self):
+        match = self.request.resolver_match
+        return match and match.view_name
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = (time.perf_counter() - started) * 1000
+        if (
+            elapsed >= settings.SLOW_QUERY_MS
+            and not many
+            and sql.lstrip().upper().startswith('SELECT')
+            and self.view_name() in settings.SLOW_QUERY_VIEWS
+        ):
+            self.slow.append((sql, params, elapsed))
+        return result
+
+    def report(self):
+        slow, self.slow = self.slow, []
+        for sql, params, elapsed in slow:
+            try:
+                plan = explain(self.connection, sql, params)
+            except Exception as error:
+                plan = {'error': str(error)}
+            logger.warning(json.dumps(
+                {
+                    'at': timezone.now().isoformat(),
+                    'view': self.view_name(),
+                    'path': self.request.path,
+                    'vendor': self.connection.vendor,
+                    'ms': round(elapsed, 2),
+                    'fingerprint': fingerprint(sql),
+                    'sql': sql,
+                    'params': list(params or ()),
+                    'plan': plan,
+                },
+                ensure_ascii=False,
+                default=str
+            ))
+
+
+class SlowQueryCaptureMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_CAPTURE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @contextmanager
+    def capture(self, request):
+        captures = [
+            SlowQueryCapture(request, connection)
+            for connection in connections.all()
+        ]
+        try:
+            with ExitStack() as stack:
+                for capture in captures:
+                    stack.enter_context(
+                        capture.connection.execute_wrapper(capture)
+                    )
+                yield
+        finally:
+            for capture in captures:
+                capture.report()
+
+    def __call__(self, request):
+        with self.capture(request):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response.streaming_content
+            )
+        return response
+
+    def stream(self, request, content):
+        with self.capture(request):
+            yield from content
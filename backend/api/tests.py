@@ -0,0 +1,797 @@
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Favorite, FeedItem, Follow, Ingredient, Recipe,
+                            RecipeIngredientQty, Shopping, ShoppingListItem,
+                            Tag)
+from recipes.relations import follow_authors, unfollow_authors
+from recipes.versions import get_versions
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from users.models import User
+
+from . import ingredient_index
+from .benchmarks import Scenario, run_scenario
+from .fields import DecodeImageField
+from .management.commands.slow_query_report import read_captures
+from .rendered_cache import rendered_cache
+from .response_cache import single_flight
+
+RECIPES_COUNT = 12
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class RecipeQueriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(10)
+        )
+        ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipes = []
+        for i in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=10, image='recipes/test.png'
+            )
+            recipe.tags.set(tags[:i % 3 + 1])
+            RecipeIngredientQty.objects.bulk_create(
+                RecipeIngredientQty(
+                    recipe=recipe,
+                    ingredient=ingredients[(i + j) % len(ingredients)],
+                    amount=j + 1
+                )
+                for j in range(4)
+            )
+            cls.recipes.append(recipe)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Shopping.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        get_versions('recipes', 'tags', 'ingredients')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_recipe_list_queries_do_not_depend_on_page_size(self):
+        for limit in (1, 6, RECIPES_COUNT):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(5):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_detail_queries_are_constant(self):
+        for recipe in self.recipes[:3]:
+            with self.subTest(recipe=recipe.id):
+                with self.assertNumQueries(6):
+                    response = self.client.get(f'/api/recipes/{recipe.id}/')
+                self.assertEqual(response.data['id'], recipe.id)
+
+    def test_recipe_etag_changes_with_author(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['author']['first_name'], 'Переименованный'
+        )
+
+    def test_anonymous_recipe_list_queries(self):
+        self.client.force_authenticate(None)
+        for limit in (1, RECIPES_COUNT):
+            cache.clear()
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(5):
+                    self.client.get('/api/recipes/', {'limit': limit})
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class IngredientIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.sugar = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+        cls.salt = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+
+    def search(self):
+        response = self.client.get('/api/ingredients/', {'name': 'с'})
+        return [item['name'] for item in response.json()]
+
+    @mock.patch('recipes.signals.schedule_variants')
+    def test_recipe_writes_keep_etag(self, schedule_variants):
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Новый рецепт', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+            RecipeIngredientQty.objects.create(
+                recipe=recipe, ingredient=self.sugar, amount=5
+            )
+        response = self.client.get(
+            '/api/ingredients/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranking_is_refreshed_by_ttl(self):
+        now = time.time()
+        with mock.patch('api.ingredient_index.time.time', return_value=now):
+            self.assertEqual(self.search(), ['сахар', 'соль'])
+            with self.captureOnCommitCallbacks(execute=True):
+                RecipeIngredientQty.objects.create(
+                    recipe=self.recipe, ingredient=self.salt, amount=5
+                )
+            with mock.patch(
+                'api.ingredient_index.build_index'
+            ) as build_index:
+                self.search()
+            build_index.assert_not_called()
+        with mock.patch(
+            'api.ingredient_index.time.time',
+            return_value=now + settings.INGREDIENT_RANKING_TTL
+        ):
+            self.assertEqual(self.search(), ['соль', 'сахар'])
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class RecipeImageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    def test_non_string_image_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        for image in (123, ['data'], {'image': 'data'}):
+            with self.subTest(image=image):
+                response = client.post('/api/recipes/', {
+                    'name': 'Рецепт',
+                    'text': 'Текст',
+                    'cooking_time': 5,
+                    'tags': [self.tag.id],
+                    'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+                    'image': image,
+                }, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.data)
+
+
+@override_settings(
+    REQUEST_TIMING_ENABLED=False, FEED_FANOUT_MAX_FOLLOWERS=1,
+    FEED_MAX_ITEMS=3
+)
+class FeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.other, cls.author = [
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='password'
+            )
+            for name in ('reader', 'other', 'author')
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, count=1):
+        recipes = []
+        for _ in range(count):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+            FeedItem.objects.fan_out(recipe)
+            recipes.append(recipe.id)
+        return recipes
+
+    def feed(self):
+        response = self.client.get('/api/recipes/feed/', {'limit': 10})
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_trim_job_caps_follower_feeds(self):
+        follow_authors(self.reader, [self.author.id])
+        recipes = self.publish(5)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 5
+        )
+        call_command('trim_feeds', stdout=io.StringIO())
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.reader).order_by(
+                '-created_at', '-id'
+            ).values_list('recipe_id', flat=True)),
+            recipes[:-4:-1]
+        )
+
+    def test_feed_keeps_posts_after_author_shrinks(self):
+        follow_authors(self.reader, [self.author.id])
+        follow_authors(self.other, [self.author.id])
+        first = self.publish()
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        unfollow_authors(self.other, [self.author.id])
+        second = self.publish()
+        self.assertEqual(self.feed(), second + first)
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class BatchRelationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author, cls.other = [
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='password'
+            )
+            for name in ('user', 'author', 'other')
+        ]
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+            RecipeIngredientQty.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10
+            )
+            cls.recipes.append(recipe.id)
+        get_versions('recipes')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, method, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def test_cart_batch_adds_and_removes_once(self):
+        url = '/api/recipes/shopping_cart/'
+        first, second, third = self.recipes[:3]
+        response = self.batch('post', url, {'recipes': [first, second]})
+        self.assertEqual(response.data, {'recipes': [first, second]})
+        response = self.batch('post', url, {'recipes': [first, third]})
+        self.assertEqual(response.data, {'recipes': [third]})
+        response = self.batch('delete', url, {'recipes': [first, first]})
+        self.assertEqual(response.data, {'recipes': [first]})
+        self.assertEqual(
+            sorted(Shopping.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            [second, third]
+        )
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(
+                user=self.user
+            ).values_list('amount', flat=True)),
+            [20]
+        )
+
+    def test_favorite_batch_updates_counters(self):
+        url = '/api/recipes/favorite/'
+        self.batch('post', url, {'recipes': self.recipes[:2]})
+        self.batch('delete', url, {'recipes': self.recipes[1:3]})
+        self.assertEqual(
+            list(Recipe.objects.filter(id__in=self.recipes[:3]).order_by(
+                'id'
+            ).values_list('favorites_count', flat=True)),
+            [1, 0, 0]
+        )
+
+    def test_batch_validation_errors(self):
+        missing = max(self.recipes) + 1
+        for url, field, data in (
+            ('/api/recipes/shopping_cart/', 'recipes', {}),
+            ('/api/recipes/shopping_cart/', 'recipes', {'recipes': []}),
+            ('/api/recipes/favorite/', 'recipes', {'recipes': ['x']}),
+            ('/api/recipes/favorite/', 'recipes', {'recipes': [missing]}),
+            (
+                '/api/recipes/favorite/', 'recipes',
+                {'recipes': list(range(1, settings.BATCH_MAX_ITEMS + 2))}
+            ),
+            ('/api/users/subscribe/', 'authors', {'authors': [0]}),
+            ('/api/users/subscribe/', 'authors', {'authors': [missing]}),
+        ):
+            with self.subTest(url=url, data=data):
+                response = self.batch('post', url, data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+        self.assertFalse(Shopping.objects.exists())
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_subscribe_batch_skips_self(self):
+        url = '/api/users/subscribe/'
+        response = self.batch('post', url, {
+            'authors': [self.user.id, self.author.id, self.other.id]
+        })
+        self.assertEqual(
+            response.data, {'authors': [self.author.id, self.other.id]}
+        )
+        response = self.batch('delete', url, {
+            'authors': [self.user.id, self.other.id]
+        })
+        self.assertEqual(response.data, {'authors': [self.other.id]})
+        self.assertEqual(
+            list(Follow.objects.values_list('user_id', 'author_id')),
+            [(self.user.id, self.author.id)]
+        )
+
+    def test_batch_queries_do_not_depend_on_size(self):
+        for url in ('/api/recipes/shopping_cart/', '/api/recipes/favorite/'):
+            for method in ('post', 'delete'):
+                with self.subTest(url=url, method=method):
+                    with CaptureQueriesContext(connection) as queries:
+                        self.batch(method, url, {'recipes': self.recipes[:2]})
+                    with self.assertNumQueries(len(queries)):
+                        self.batch(method, url, {'recipes': self.recipes})
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = [
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='password'
+            )
+            for name in ('user', 'author')
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            ).id
+            for i in range(7)
+        ]
+        get_versions('recipes', 'tags', 'ingredients')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, insert):
+        ids = []
+        response = self.client.get(url)
+        self.assertNotIn('count', response.data)
+        while True:
+            ids += [item['id'] for item in response.data['results']]
+            if response.data['next'] is None:
+                return ids
+            insert()
+            response = self.client.get(response.data['next'])
+
+    def create_author(self):
+        count = User.objects.count()
+        return User.objects.create_user(
+            username=f'author{count}', email=f'author{count}@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+
+    def test_recipe_cursor_is_stable_across_inserts(self):
+        def insert():
+            Recipe.objects.create(
+                author=self.author, name='Новый', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+
+        ids = self.walk('/api/recipes/?cursor=&limit=3', insert)
+        self.assertEqual(ids, self.recipes[::-1])
+
+    def test_subscription_cursor_is_stable_across_inserts(self):
+        authors = [self.create_author() for _ in range(5)]
+        follow_authors(self.user, [author.id for author in authors])
+        ids = self.walk(
+            '/api/users/subscriptions/?cursor=&limit=2',
+            lambda: follow_authors(self.user, [self.create_author().id])
+        )
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            set(ids),
+            set(Follow.objects.filter(user=self.user).values_list(
+                'author_id', flat=True
+            ))
+        )
+
+    def test_page_pagination_without_cursor(self):
+        for url in (
+            '/api/recipes/?page=2&limit=3',
+            '/api/recipes/?page=2&limit=3&cursor=&search=Рецепт',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.data['count'], len(self.recipes))
+                self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get('/api/recipes/?page=2&limit=3')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            self.recipes[-4:-7:-1]
+        )
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class RenderedListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def get(self, encoding, **headers):
+        return self.client.get(
+            '/api/tags/', HTTP_ACCEPT_ENCODING=encoding, **headers
+        )
+
+    def test_gzip_follows_quality_values(self):
+        for encoding, gzipped in (
+            ('gzip', True),
+            ('gzip, deflate, br', True),
+            ('gzip;q=0', False),
+            ('gzip;q=0, *', False),
+            ('*', True),
+            ('*;q=0', False),
+            ('identity', False),
+        ):
+            with self.subTest(encoding=encoding):
+                response = self.get(encoding)
+                self.assertEqual(
+                    response.get('Content-Encoding') == 'gzip', gzipped
+                )
+
+    def test_etag_depends_on_encoding(self):
+        gzipped = self.get('gzip')
+        plain = self.get('identity')
+        self.assertNotEqual(gzipped['ETag'], plain['ETag'])
+        response = self.get('identity', HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.get('gzip', HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_cache_key_ignores_unused_params(self):
+        rendered_cache.entries.clear()
+        for params in ({}, {'junk': 1}, {'junk': 2, 'name': 'x'}):
+            self.client.get('/api/tags/', params)
+        self.assertEqual(len(rendered_cache.entries), 1)
+        for name in ('С', 'с', 'сахар', 'сахарный песок'):
+            self.client.get('/api/ingredients/', {'name': name, 'junk': 1})
+        self.assertEqual(len(rendered_cache.entries), 2)
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class RecipeSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.by_name = Recipe.objects.create(
+            author=author, name='Борщ', text='Суп со свеклой',
+            cooking_time=60, image='recipes/test.png'
+        )
+        cls.by_text = Recipe.objects.create(
+            author=author, name='Суп', text='Почти как борщ',
+            cooking_time=30, image='recipes/test.png'
+        )
+
+    def test_search_ignores_cursor(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'борщ', 'cursor': ''}
+        )
+        self.assertIn('count', response.data)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.by_name.id, self.by_text.id]
+        )
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class RecipeWriteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(2)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(20)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        get_versions('recipes')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        patcher = mock.patch.object(
+            DecodeImageField, 'to_internal_value',
+            return_value='recipes/test.png'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def body(self, count, amount=1):
+        return {
+            'name': 'Рецепт',
+            'text': 'Текст',
+            'cooking_time': 5,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount + i}
+                for i, ingredient in enumerate(self.ingredients[:count])
+            ],
+            'image': 'image',
+        }
+
+    def create_recipe(self, count):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+        recipe.tags.set(self.tags)
+        RecipeIngredientQty.objects.bulk_create(
+            RecipeIngredientQty(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[:count]
+        )
+        return recipe
+
+    def update_recipe(self, recipe, count):
+        return self.client.patch(
+            f'/api/recipes/{recipe.id}/', self.body(count, amount=5),
+            format='json'
+        )
+
+    def test_create_queries_do_not_depend_on_ingredients(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/recipes/', self.body(2), format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.post(
+                '/api/recipes/', self.body(15), format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_update_queries_do_not_depend_on_ingredients(self):
+        small, large = self.create_recipe(2), self.create_recipe(15)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.update_recipe(small, 2)
+        self.assertEqual(response.status_code, 200, response.data)
+        with self.assertNumQueries(len(queries)):
+            response = self.update_recipe(large, 15)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_missing_ingredient_id_is_a_validation_error(self):
+        body = self.body(2)
+        del body['ingredients'][0]['id']
+        response = self.client.post('/api/recipes/', body, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+
+
+@override_settings(
+    REQUEST_TIMING_ENABLED=True, SERVER_TIMING_HEADER=False,
+    SLOW_REQUEST_MS=60000, SLOW_QUERY_MS=0
+)
+class SlowQueryCaptureTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+        get_versions('recipes')
+
+    def timing(self, capture):
+        cache.clear()
+        with self.settings(SLOW_QUERY_CAPTURE=capture):
+            client = APIClient()
+            client.force_authenticate(self.author)
+            with self.assertLogs('api.middleware', 'INFO') as logs:
+                response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(logs.records[-1].getMessage())
+
+    def test_explain_is_not_timed(self):
+        plain = self.timing(False)
+        with self.assertLogs('api.slow_queries', 'WARNING') as logs:
+            captured = self.timing(True)
+        self.assertEqual(captured['queries'], plain['queries'])
+        self.assertFalse(captured['slowest_sql'].startswith('EXPLAIN'))
+        captures = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertTrue(captures)
+        for capture in captures:
+            self.assertEqual(capture['view'], 'recipes-list')
+            self.assertNotIn('error', capture['plan'])
+
+    def test_report_skips_truncated_lines(self):
+        capture = {
+            'fingerprint': 'f', 'sql': 'SELECT 1', 'ms': 150,
+            'view': 'recipes-list',
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'slow.ndjson')
+            path.write_text(
+                json.dumps(capture) + '\n' + json.dumps(capture)[:10],
+                encoding='utf-8'
+            )
+            self.assertEqual(list(read_captures(str(path))), [capture])
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class ListCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+        get_versions('recipes', 'tags', 'ingredients')
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('recipes.signals.schedule_variants')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def names(self):
+        response = self.client.get('/api/recipes/', {'limit': 10})
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_writes_invalidate_anonymous_list(self):
+        self.assertEqual(self.names(), ['Рецепт'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                author=self.author, name='Новый', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+        self.assertEqual(self.names(), ['Новый', 'Рецепт'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Старый'
+            self.recipe.save()
+        self.assertEqual(self.names(), ['Новый', 'Старый'])
+
+    def test_waiter_returns_result_of_lock_owner(self):
+        cache.add('key:lock', 'owner')
+        compute = mock.Mock()
+        with mock.patch(
+            'api.response_cache.time.sleep',
+            side_effect=lambda seconds: cache.set('key', ['cached'])
+        ):
+            response = single_flight('key', compute, 60)
+        self.assertEqual(response.data, ['cached'])
+        compute.assert_not_called()
+
+    def test_timed_out_waiter_keeps_foreign_lock(self):
+        cache.add('key:lock', 'owner')
+        compute = mock.Mock(return_value=Response(['computed']))
+        with mock.patch('api.response_cache.LOCK_TIMEOUT', 0), mock.patch(
+            'api.response_cache.time.sleep'
+        ):
+            response = single_flight('key', compute, 60)
+        self.assertEqual(response.data, ['computed'])
+        self.assertEqual(cache.get('key:lock'), 'owner')
+
+    def test_owner_releases_its_lock(self):
+        compute = mock.Mock(return_value=Response(['computed']))
+        single_flight('key', compute, 60)
+        self.assertIsNone(cache.get('key:lock'))
+        self.assertEqual(cache.get('key'), ['computed'])
+
+
+@override_settings(REQUEST_TIMING_ENABLED=False)
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+        get_versions('recipes', 'tags', 'ingredients')
+
+    def test_writes_run_commit_hooks_and_roll_back(self):
+        scenario = Scenario(
+            'recipe_update', 'patch', f'/api/recipes/{self.recipe.id}/',
+            user=self.author, data={'name': 'Изменён'}, writes=True
+        )
+        with mock.patch('recipes.versions.save_versions') as save_versions:
+            result = run_scenario(scenario, iterations=2, warmup=0)
+        self.assertEqual(result['status'], [200])
+        self.assertEqual(save_versions.call_count, 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Рецепт')
+
+    def test_cold_runs_clear_every_cache(self):
+        scenario = Scenario('ingredients', 'get', '/api/ingredients/')
+        with mock.patch(
+            'api.ingredient_index.build_index',
+            wraps=ingredient_index.build_index
+        ) as build_index:
+            run_scenario(scenario, iterations=2, warmup=0, cold=True)
+            self.assertEqual(build_index.call_count, 2)
+            run_scenario(scenario, iterations=2, warmup=0)
+            self.assertEqual(build_index.call_count, 2)
@@ -1,86 +1,159 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters import rest_framework as filters
-from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredientQty, Shopping, Tag)
+from recipes.catalog import export_recipes, stream_ndjson
+from recipes.models import (FeedItem, Follow, Ingredient, Recipe,
+                            ShoppingListItem, Tag)
+from recipes.relations import (add_favorites, add_to_cart,
+                               explicit_side_effects, follow_authors,
+                               remove_favorites, remove_from_cart,
+                               unfollow_authors)
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from users.models import User
 
-from .filters import IngredientFilter, RecipeFilter
+from .conditional import recipe_condition, request_versions, version_condition
+from .filters import RecipeFilter
+from .ingredient_index import (INDEX_VERSIONS, get_ingredient_index,
+                               ranking_epoch)
+from .paginators import (CursorPaginationMixin, RecipeCursorPagination,
+                         SubscriptionCursorPagination)
 from .permissions import CurrentUserOrAdminOrReadOnly
-from .serializers import (FollowSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeMainSerializer,
-                          TagSerializer, UserCreateSerializer, UserSerializer)
+from .rendered_cache import RenderedListMixin
+from .renderers import CSVRenderer, NDJSONRenderer, PlainTextRenderer
+from .response_cache import AnonymousListCacheMixin
+from .serializers import (AuthorBatchSerializer, FavoriteSerializer,
+                          FollowSerializer, IngredientSerializer,
+                          RecipeBatchSerializer, RecipeCreateSerializer,
+                          RecipeMainSerializer, TagSerializer,
+                          UserCreateSerializer, UserSerializer)
+from .shopping_cart import EXPORTERS, SHOPPING_FILENAME
 
-INGREDIENT_POSITION_CART = '{} {} --- {} {}\n'
-SHOP_CART_HEADING = 'Список ингридиентов для похода в магазин\n\n'
-SHOPPING_FILENAME = 'shopping_cart.txt'
+CATALOG_FILENAME = 'recipes.ndjson'
+RENDERED_NAME_MAX_LENGTH = 3
+RENDERED_LIMIT_MAX = 50
 BAD_REQUEST_ERRORS = {
     'already_favorited': 'Рецепт уже есть в избранном',
     'not_favorited': 'Рецепта нет в избранном',
     'already_in_cart': 'Рецепт уже есть в корзине',
     'not_in_cart': 'Рецепта нет в корзине',
+    'already_subscribed': 'Вы уже подписаны на этого автора',
+    'not_subscribed': 'Вы не подписаны на этого автора',
+    'self_subscribe': 'Нельзя подписаться на самого себя',
 }
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(version_condition('tags'), name='list')
+@method_decorator(version_condition('tags'), name='retrieve')
+class TagViewSet(RenderedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
+    rendered_versions = ('tags',)
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = [permissions.AllowAny]
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousListCacheMixin, CursorPaginationMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    cursor_pagination_class = RecipeCursorPagination
+    cursor_excluded_params = ('search',)
     permission_classes = (CurrentUserOrAdminOrReadOnly,)
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return Recipe.objects.all()
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeMainSerializer
 
+    @method_decorator(recipe_condition)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        FeedItem.objects.fan_out(recipe)
 
-    @staticmethod
-    def post_method_for_actions(request, recipe, serializer, model):
-        user = request.user
-        new_obj = model(user=user, recipe=recipe)
-        new_obj.save()
+    def perform_destroy(self, instance):
+        user_ids = list(
+            instance.shopping_cards.values_list('user_id', flat=True)
+        )
+        with transaction.atomic(), explicit_side_effects():
+            instance.delete()
+            ShoppingListItem.objects.rebuild(user_ids)
+
+    def post_method_for_actions(self, request, add, error):
+        recipe = self.get_object()
+        if not add(request.user, [recipe.id]):
+            return Response(
+                {'errors': BAD_REQUEST_ERRORS[error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = FavoriteSerializer(recipe, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @staticmethod
-    def delete_method_for_actions(request, recipe, model):
-        user = request.user
-        model_obj = get_object_or_404(model, user=user, recipe=recipe)
-        model_obj.delete()
+    def delete_method_for_actions(self, request, remove, error):
+        recipe = self.get_object()
+        if not remove(request.user, [recipe.id]):
+            return Response(
+                {'errors': BAD_REQUEST_ERRORS[error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def batch_method_for_actions(request, add, remove):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        method = add if request.method == 'POST' else remove
+        changed = method(
+            request.user, serializer.validated_data['recipes']
+        )
+        return Response({'recipes': sorted(changed)})
+
     @action(detail=True, methods=['POST'],
             permission_classes=[permissions.IsAuthenticated],
             name='Add to favorites'
             )
     def favorite(self, request, pk=None):
-        recipe = self.get_object()
-        serializer = self.get_serializer(recipe)
         return self.post_method_for_actions(
             request=request,
-            recipe=recipe,
-            serializer=serializer,
-            model=Favorite
+            add=add_favorites,
+            error='already_favorited'
         )
 
     @favorite.mapping.delete
     def unfavorite(self, request, pk=None):
         return self.delete_method_for_actions(
             request=request,
-            recipe=self.get_object(),
-            model=Favorite
+            remove=remove_favorites,
+            error='not_favorited'
+        )
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='favorite',
+            name='Batch favorites'
+            )
+    def favorite_batch(self, request):
+        return self.batch_method_for_actions(
+            request=request,
+            add=add_favorites,
+            remove=remove_favorites
         )
 
     @action(detail=True, methods=['POST'],
@@ -88,74 +161,161 @@ class RecipeViewSet(viewsets.ModelViewSet):
             name='Add to shopping cart'
             )
     def shopping_cart(self, request, pk=None):
-        recipe = self.get_object()
-        serializer = self.get_serializer(recipe)
         return self.post_method_for_actions(
             request=request,
-            recipe=recipe,
-            serializer=serializer,
-            model=Shopping
+            add=add_to_cart,
+            error='already_in_cart'
         )
 
     @shopping_cart.mapping.delete
     def unshopping_cart(self, request, pk=None):
         return self.delete_method_for_actions(
             request=request,
-            recipe=self.get_object(),
-            model=Shopping
+            remove=remove_from_cart,
+            error='not_in_cart'
+        )
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='shopping_cart',
+            name='Batch shopping cart'
+            )
+    def shopping_cart_batch(self, request):
+        return self.batch_method_for_actions(
+            request=request,
+            add=add_to_cart,
+            remove=remove_from_cart
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def feed(self, request):
+        user = request.user
+        large_authors = list(Follow.objects.filter(
+            user=user, author__feed_pulled=True
+        ).values_list('author_id', flat=True))
+        if large_authors:
+            recipes = Recipe.objects.filter(
+                Q(id__in=user.feed_items.values('recipe_id'))
+                | Q(author_id__in=large_authors)
+            )
+        else:
+            recipes = Recipe.objects.filter(feed_items__user=user).order_by(
+                '-feed_items__created_at', '-feed_items__id'
+            )
+        page = self.paginate_queryset(
+            recipes.with_related().with_user_flags(user)
         )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAdminUser],
+        renderer_classes=[NDJSONRenderer, JSONRenderer],
+    )
+    def export(self, request):
+        response = StreamingHttpResponse(
+            stream_ndjson(export_recipes()),
+            content_type=f'{NDJSONRenderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={CATALOG_FILENAME}'
+        )
+        return response
 
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer],
     )
     def download_shopping_cart(self, request):
-        shopping_cart = {}
-        ingredients = RecipeIngredientQty.objects.filter(
-            recipe__shopping_cards__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values_list(
             'ingredient__name',
             'ingredient__measurement_unit',
-        ).annotate(Sum('amount'))
-        content = SHOP_CART_HEADING
-        for item in ingredients:
-            name = item[0]
-            if name not in shopping_cart:
-                shopping_cart[name] = {
-                    'measurement_unit': item[1],
-                    'amount': item[2]
-                }
-        for i, (name, data) in enumerate(shopping_cart.items(), 1):
-            content += INGREDIENT_POSITION_CART.format(
-                i,
-                name,
-                data["amount"],
-                data["measurement_unit"]
-            )
-        response = HttpResponse(content, content_type='text/plain')
+            'amount',
+        ).order_by(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
         response['Content-Disposition'] = (
-            f'attachment; filename={SHOPPING_FILENAME}'
+            'attachment; filename='
+            f'{SHOPPING_FILENAME.format(renderer.format)}'
         )
         return response
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(version_condition('ingredients'), name='list')
+@method_decorator(version_condition('ingredients'), name='retrieve')
+class IngredientViewSet(RenderedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
+    rendered_versions = ('ingredients',)
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (filters.DjangoFilterBackend,)
-    filterset_class = IngredientFilter
     permission_classes = [permissions.AllowAny]
 
+    def search_params(self, request):
+        limit = request.query_params.get('limit', '')
+        return (
+            request.query_params.get('name', '').lower(),
+            int(limit) if limit.isdigit() else None,
+        )
+
+    def rendered_params(self, request):
+        name, limit = self.search_params(request)
+        if len(name) > RENDERED_NAME_MAX_LENGTH or (
+            limit is not None and limit > RENDERED_LIMIT_MAX
+        ):
+            return None
+        return name, limit, ranking_epoch()
+
+    def list_response(self, request, *args, **kwargs):
+        index = get_ingredient_index(
+            tuple(request_versions(request, *INDEX_VERSIONS))
+        )
+        return Response(index.search(*self.search_params(request)))
+
+
+def subscription_recipes(request, recipes):
+    limit = request.query_params.get('recipes_limit', '')
+    if limit.isdigit():
+        recipes = recipes.latest_per_author(int(limit))
+    return Prefetch('recipes', queryset=recipes)
+
 
 @api_view(['POST', 'DELETE'])
 @permission_classes((permissions.IsAuthenticated, ))
 def subscribe(request, user_id=None):
+    user = request.user
     if request.method == 'POST':
-        user = request.user
-        subscribe_user = get_object_or_404(User, id=user_id)
-        Follow.objects.get_or_create(user=user, author=subscribe_user)
+        subscribe_user = get_object_or_404(
+            User.objects.prefetch_related(subscription_recipes(
+                request, Recipe.objects.filter(author_id=user_id)
+            )),
+            id=user_id
+        )
+        if subscribe_user == user:
+            return Response(
+                {'errors': BAD_REQUEST_ERRORS['self_subscribe']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not follow_authors(user, [subscribe_user.id]):
+            return Response(
+                {'errors': BAD_REQUEST_ERRORS['already_subscribed']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         serializer = FollowSerializer(
             subscribe_user,
             context={'request': request}
@@ -165,23 +325,48 @@ def subscribe(request, user_id=None):
             status=status.HTTP_201_CREATED
         )
     elif request.method == 'DELETE':
-        user = request.user
         author = get_object_or_404(User, id=user_id)
-        follow = get_object_or_404(Follow, user=user, author=author)
-        follow.delete()
+        if not unfollow_authors(user, [author.id]):
+            return Response(
+                {'errors': BAD_REQUEST_ERRORS['not_subscribed']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
 
 
-class UserSubscriptionListView(generics.ListAPIView):
+@api_view(['POST', 'DELETE'])
+@permission_classes((permissions.IsAuthenticated, ))
+def subscribe_batch(request):
+    serializer = AuthorBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    method = follow_authors if request.method == 'POST' else unfollow_authors
+    changed = method(request.user, serializer.validated_data['authors'])
+    return Response({'authors': sorted(changed)})
+
+
+class UserSubscriptionListView(CursorPaginationMixin,
+                               generics.ListAPIView):
     serializer_class = FollowSerializer
+    cursor_pagination_class = SubscriptionCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        authors = User.objects.filter(followers__user=user)
-        return authors
+        return User.objects.filter(
+            followers__user=self.request.user
+        ).order_by('id')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prefetch_related_objects(page, subscription_recipes(
+                self.request,
+                Recipe.objects.filter(
+                    author_id__in=[author.id for author in page]
+                )
+            ))
+        return page
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -199,5 +384,7 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def me(self, request, pk=None):
         user = self.request.user
-        serializer = UserSerializer(user)
+        serializer = UserSerializer(
+            user, context=self.get_serializer_context()
+        )
         return Response(serializer.data)
@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.slow_queries.SlowQueryCaptureMiddleware',
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +74,16 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -105,6 +117,95 @@ MEDIA_URL = '/media_backend/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media_backend')
 
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv('IMAGE_UPLOAD_MAX_BYTES', default=10 * 1024 * 1024)
+)
+
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv(
+        'DATA_UPLOAD_MAX_MEMORY_SIZE',
+        default=IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024
+    )
+)
+
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', default=40_000_000)
+)
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', default=2))
+
+FEED_MAX_ITEMS = int(os.getenv('FEED_MAX_ITEMS', default=500))
+
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=5000)
+)
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', default=100))
+
+INGREDIENT_RANKING_TTL = int(
+    os.getenv('INGREDIENT_RANKING_TTL', default=3600)
+)
+
+RECIPE_LIST_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_LIST_CACHE_TIMEOUT', default=300)
+)
+
+REQUEST_TIMING_ENABLED = (
+    os.getenv('REQUEST_TIMING_ENABLED', default='false').lower() == 'true'
+)
+
+SERVER_TIMING_HEADER = (
+    os.getenv('SERVER_TIMING_HEADER', default='false').lower() == 'true'
+)
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+
+SLOW_QUERY_CAPTURE = (
+    os.getenv('SLOW_QUERY_CAPTURE', default='false').lower() == 'true'
+)
+
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', default=100))
+
+SLOW_QUERY_VIEWS = os.getenv(
+    'SLOW_QUERY_VIEWS',
+    default=(
+        'recipes-list,recipes-shopping-cart,recipes-shopping-cart-batch,'
+        'recipes-download-shopping-cart,my_subscribe_list'
+    )
+).split(',')
+
+SLOW_QUERY_LOG = os.getenv(
+    'SLOW_QUERY_LOG', default=os.path.join(BASE_DIR, 'slow_queries.ndjson')
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'api.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
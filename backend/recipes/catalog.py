@@ -0,0 +1,253 @@
+import json
+import uuid
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from users.models import User
+
+from .counters import recount
+from .models import FeedItem, Ingredient, Recipe, RecipeIngredientQty, Tag
+from .versions import bump_version
+
+CATALOG_CHUNK_SIZE = 2000
+TAG_UNIQUE_FIELDS = {'name': 'название', 'color': 'цвет'}
+RECIPE_FIELDS = (
+    'id',
+    'uid',
+    'author__email',
+    'name',
+    'text',
+    'cooking_time',
+    'image',
+    'created_at',
+)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def create_ids(model, objects, key):
+    objects = model.objects.bulk_create(objects)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [obj.pk for obj in objects]
+    ids = dict(model.objects.filter(**{
+        f'{key}__in': [getattr(obj, key) for obj in objects]
+    }).values_list(key, 'id'))
+    return [ids[getattr(obj, key)] for obj in objects]
+
+
+def export_recipes(chunk_size=CATALOG_CHUNK_SIZE):
+    rows = Recipe.objects.order_by('id').values_list(
+        *RECIPE_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    for chunk in batches(rows, chunk_size):
+        recipe_ids = [row[0] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug, name, color in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'tag__slug', 'tag__name', 'tag__color'):
+            tags[recipe_id].append(
+                {'slug': slug, 'name': name, 'color': color}
+            )
+        ingredients = defaultdict(list)
+        for recipe_id, name, measurement_unit, amount in (
+            RecipeIngredientQty.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by('id').values_list(
+                'recipe_id',
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'amount',
+            )
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        for (recipe_id, uid, author, name, text, cooking_time, image,
+             created_at) in chunk:
+            yield {
+                'uid': str(uid),
+                'author': author,
+                'name': name,
+                'text': text,
+                'cooking_time': cooking_time,
+                'image': image,
+                'created_at': created_at.isoformat(),
+                'tags': tags[recipe_id],
+                'ingredients': ingredients[recipe_id],
+            }
+
+
+def stream_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'Строка {number}: {error}')
+
+
+def tag_conflicts(tags):
+    taken = {}
+    for slug, name, color in Tag.objects.filter(
+        Q(name__in={tag['name'] for tag in tags})
+        | Q(color__in={tag['color'] for tag in tags})
+    ).values_list('slug', 'name', 'color'):
+        taken[('name', name)] = taken[('color', color)] = slug
+    for tag in tags:
+        for field, label in TAG_UNIQUE_FIELDS.items():
+            key = (field, tag[field])
+            if key in taken:
+                yield (
+                    f'тег {tag["slug"]}: {label} {tag[field]} '
+                    f'уже занят тегом {taken[key]}'
+                )
+            else:
+                taken[key] = tag['slug']
+
+
+def resolve_tags(records):
+    tags = {
+        tag['slug']: tag for record in records for tag in record['tags']
+    }
+    ids = dict(Tag.objects.filter(slug__in=tags).values_list('slug', 'id'))
+    new = [tag for slug, tag in tags.items() if slug not in ids]
+    if not new:
+        return ids
+    conflicts = list(tag_conflicts(new))
+    if conflicts:
+        raise ValueError('; '.join(conflicts))
+    ids.update(zip(
+        [tag['slug'] for tag in new],
+        create_ids(Tag, [Tag(**tag) for tag in new], 'slug')
+    ))
+    return ids
+
+
+def resolve_ingredients(records):
+    keys = {
+        (ingredient['name'], ingredient['measurement_unit'])
+        for record in records for ingredient in record['ingredients']
+    }
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in keys
+        ],
+        ignore_conflicts=True
+    )
+    return {
+        (name, measurement_unit): ingredient_id
+        for name, measurement_unit, ingredient_id
+        in Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).values_list('name', 'measurement_unit', 'id')
+        if (name, measurement_unit) in keys
+    }
+
+
+@transaction.atomic
+def import_batch(records):
+    stats = Counter()
+    authors = dict(User.objects.filter(
+        email__in={record['author'] for record in records}
+    ).values_list('email', 'id'))
+    uids = [uuid.UUID(record['uid']) for record in records]
+    existing = set(Recipe.objects.filter(uid__in=uids).values_list(
+        'uid', flat=True
+    ))
+    new = {}
+    for uid, record in zip(uids, records):
+        if uid in existing or uid in new:
+            stats['duplicates'] += 1
+        elif record['author'] not in authors:
+            stats['unknown_authors'] += 1
+        else:
+            new[uid] = record
+    if not new:
+        return stats
+    records = list(new.values())
+    tags = resolve_tags(records)
+    ingredients = resolve_ingredients(records)
+    recipe_ids = dict(zip(new, create_ids(
+        Recipe,
+        [
+            Recipe(
+                uid=uid,
+                author_id=authors[record['author']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+            )
+            for uid, record in new.items()
+        ],
+        'uid'
+    )))
+    Recipe.objects.set_created_at({
+        recipe_ids[uid]: parse_datetime(record['created_at'])
+        for uid, record in new.items() if record.get('created_at')
+    })
+    Recipe.tags.through.objects.bulk_create(
+        [
+            Recipe.tags.through(recipe_id=recipe_ids[uid], tag_id=tags[tag])
+            for uid, record in new.items()
+            for tag in {tag['slug'] for tag in record['tags']}
+        ],
+        ignore_conflicts=True
+    )
+    RecipeIngredientQty.objects.bulk_create(
+        [
+            RecipeIngredientQty(
+                recipe_id=recipe_ids[uid],
+                ingredient_id=ingredients[
+                    (ingredient['name'], ingredient['measurement_unit'])
+                ],
+                amount=ingredient['amount'],
+            )
+            for uid, record in new.items()
+            for ingredient in record['ingredients']
+        ],
+        ignore_conflicts=True
+    )
+    recount(
+        User, 'recipes_count', Recipe, 'author',
+        User.objects.filter(
+            id__in={authors[record['author']] for record in records}
+        )
+    )
+    FeedItem.objects.fan_out_recipes(
+        Recipe.objects.filter(
+            id__in=recipe_ids.values()
+        ).values_list('id', 'author_id', 'created_at')
+    )
+    bump_version('recipes', 'tags', 'ingredients')
+    stats['imported'] = len(new)
+    return stats
+
+
+def import_recipes(records, batch_size=CATALOG_CHUNK_SIZE):
+    stats = Counter()
+    for batch in batches(records, batch_size):
+        stats['total'] += len(batch)
+        stats += import_batch(batch)
+    FeedItem.objects.trim()
+    return stats
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from users.models import User
+
+from .models import Favorite, Follow, Recipe
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    if pks:
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def live_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount(model, field, source, source_field, queryset=None):
+    if queryset is None:
+        queryset = model.objects.all()
+    broken = queryset.annotate(
+        live=live_count(source, source_field)
+    ).exclude(**{field: F('live')}).count()
+    queryset.update(**{field: live_count(source, source_field)})
+    return broken
+
+
+def recount_all(recipes=None, users=None):
+    return {
+        field: recount(
+            model, field, source, source_field,
+            recipes if model is Recipe else users
+        )
+        for model, field, source, source_field in COUNTERS
+    }
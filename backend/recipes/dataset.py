@@ -0,0 +1,254 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from users.models import User
+
+from .catalog import batches, create_ids
+from .counters import recount_all
+from .models import (Favorite, FeedItem, Follow, Ingredient, Recipe,
+                     RecipeIngredientQty, Shopping, ShoppingListItem, Tag)
+from .versions import bump_version
+
+DATASET_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+DATASET_INGREDIENTS = 2000
+DATASET_UNITS = ('г', 'мл', 'шт.', 'ст. л.', 'по вкусу')
+DATASET_PERIOD_DAYS = 365
+PLACEHOLDER_IMAGE = 'recipes/placeholder.png'
+PLACEHOLDER_SIZE = (960, 640)
+PLACEHOLDER_COLOR = '#E0E0E0'
+
+
+class ZipfSampler:
+
+    def __init__(self, population, exponent, rng):
+        self.population = list(population)
+        self.rng = rng
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(population) + 1)
+        ))
+
+    def choice(self):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights
+        )[0]
+
+    def sample(self, size, exclude=None):
+        size = min(size, len(self.population) // 2)
+        chosen = set()
+        while len(chosen) < size:
+            for item in self.rng.choices(
+                self.population, cum_weights=self.cum_weights,
+                k=size - len(chosen)
+            ):
+                if item != exclude:
+                    chosen.add(item)
+        return chosen
+
+
+def ensure_catalog():
+    Tag.objects.bulk_create(
+        [
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in DATASET_TAGS
+        ],
+        ignore_conflicts=True
+    )
+    if not Ingredient.objects.exists():
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=f'ингредиент {i}',
+                    measurement_unit=DATASET_UNITS[i % len(DATASET_UNITS)]
+                )
+                for i in range(DATASET_INGREDIENTS)
+            ],
+            batch_size=1000
+        )
+    return (
+        list(Tag.objects.order_by('id').values_list('id', flat=True)),
+        list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        )),
+    )
+
+
+def ensure_placeholder():
+    if default_storage.exists(PLACEHOLDER_IMAGE):
+        return PLACEHOLDER_IMAGE
+    buffer = BytesIO()
+    Image.new('RGB', PLACEHOLDER_SIZE, PLACEHOLDER_COLOR).save(buffer, 'PNG')
+    return default_storage.save(
+        PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue())
+    )
+
+
+def create_users(prefix, count, password, batch_size):
+    password = make_password(password)
+    user_ids = []
+    for batch in batches(range(count), batch_size):
+        user_ids.extend(create_ids(
+            User,
+            [
+                User(
+                    email=f'{prefix}{i}@example.com',
+                    username=f'{prefix}{i}',
+                    first_name='Имя',
+                    last_name=f'Фамилия {i}',
+                    password=password,
+                )
+                for i in batch
+            ],
+            'email'
+        ))
+    return user_ids
+
+
+def create_recipes(options, rng, user_ids, tag_ids, ingredient_ids):
+    prefix = options['prefix']
+    authors = ZipfSampler(user_ids, options['author_skew'], rng)
+    image = ensure_placeholder()
+    now = timezone.now()
+    recipe_ids = []
+    for batch in batches(range(options['recipes']), options['batch_size']):
+        batch_ids = create_ids(
+            Recipe,
+            [
+                Recipe(
+                    name=f'{prefix} рецепт {i}',
+                    text=f'Описание рецепта {i}',
+                    cooking_time=rng.randint(5, 180),
+                    image=image,
+                    author_id=authors.choice(),
+                )
+                for i in batch
+            ],
+            'uid'
+        )
+        Recipe.objects.set_created_at({
+            recipe_id: now - timedelta(
+                seconds=rng.randint(0, DATASET_PERIOD_DAYS * 86400)
+            )
+            for recipe_id in batch_ids
+        })
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch_ids
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, len(tag_ids))
+                )
+            ]
+        )
+        RecipeIngredientQty.objects.bulk_create(
+            [
+                RecipeIngredientQty(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe_id in batch_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, rng.randint(*options['ingredients'])
+                )
+            ]
+        )
+        recipe_ids.extend(batch_ids)
+    return recipe_ids
+
+
+def create_relations(model, target_field, rows, batch_size):
+    for batch in batches(rows, batch_size):
+        model.objects.bulk_create(
+            [
+                model(user_id=user_id, **{target_field: target_id})
+                for user_id, target_id in batch
+            ],
+            ignore_conflicts=True
+        )
+
+
+def follow_rows(options, rng, user_ids):
+    authors = ZipfSampler(user_ids, options['follow_skew'], rng)
+    for user_id in user_ids:
+        for author_id in authors.sample(
+            rng.randint(0, 2 * options['follows']), exclude=user_id
+        ):
+            yield user_id, author_id
+
+
+def recipe_rows(rng, user_ids, recipes, size, heavy_users, heavy_size):
+    heavy = set(rng.sample(user_ids, min(heavy_users, len(user_ids))))
+    for user_id in user_ids:
+        count = heavy_size if user_id in heavy else rng.randint(0, 2 * size)
+        for recipe_id in recipes.sample(count):
+            yield user_id, recipe_id
+
+
+def fan_out_feeds(recipe_ids, batch_size):
+    for batch in batches(recipe_ids, batch_size):
+        FeedItem.objects.fan_out_recipes(
+            Recipe.objects.filter(id__in=batch).values_list(
+                'id', 'author_id', 'created_at'
+            )
+        )
+    FeedItem.objects.trim()
+
+
+def generate_dataset(options, log):
+    rng = random.Random(options['seed'])
+    batch_size = options['batch_size']
+    with transaction.atomic():
+        tag_ids, ingredient_ids = ensure_catalog()
+        user_ids = create_users(
+            options['prefix'], options['users'], options['password'],
+            batch_size
+        )
+        log(f'Пользователи: {len(user_ids)}')
+        recipe_ids = create_recipes(
+            options, rng, user_ids, tag_ids, ingredient_ids
+        )
+        log(f'Рецепты: {len(recipe_ids)}')
+        create_relations(
+            Follow, 'author_id', follow_rows(options, rng, user_ids),
+            batch_size
+        )
+        log('Подписки созданы')
+        popular = ZipfSampler(recipe_ids, options['favorite_skew'], rng)
+        create_relations(
+            Favorite, 'recipe_id',
+            recipe_rows(
+                rng, user_ids, popular, options['favorites'], 0, 0
+            ),
+            batch_size
+        )
+        log('Избранное создано')
+        create_relations(
+            Shopping, 'recipe_id',
+            recipe_rows(
+                rng, user_ids, popular, options['cart'],
+                options['heavy_carts'], options['heavy_cart_size']
+            ),
+            batch_size
+        )
+        log('Корзины созданы')
+        recount_all()
+        ShoppingListItem.objects.rebuild()
+        log('Счётчики и списки покупок пересчитаны')
+        if options['feeds']:
+            fan_out_feeds(recipe_ids, batch_size)
+            log('Ленты подписок заполнены')
+        bump_version('recipes', 'tags', 'ingredients')
+    return user_ids, recipe_ids
@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+from .versions import bump_version
+
+IMAGE_VARIANTS = {
+    'card': 480,
+    'detail': 960,
+    'retina': 1920,
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_PATH = 'variants/{}_{}.webp'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants'
+        )
+    return _executor
+
+
+def variants_ready(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') == recipe.image.name
+    )
+
+
+def render_variant(image, width):
+    variant = image.copy()
+    variant.thumbnail((width, width * 10))
+    buffer = BytesIO()
+    variant.save(buffer, VARIANT_FORMAT, quality=80, method=4)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id, source):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with default_storage.open(source) as image_file:
+        image = Image.open(image_file)
+        image.draft('RGB', (max(IMAGE_VARIANTS.values()),) * 2)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    variants = {'source': source}
+    for variant, width in IMAGE_VARIANTS.items():
+        variants[variant] = default_storage.save(
+            VARIANT_PATH.format(stem, variant),
+            render_variant(image, width)
+        )
+    Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    bump_version('recipes')
+
+
+def try_generate_variants(recipe_id, source):
+    try:
+        generate_variants(recipe_id, source)
+    except Exception:
+        logger.exception('Не удалось подготовить изображения %s', source)
+
+
+def generate_variants_in_worker(recipe_id, source):
+    try:
+        try_generate_variants(recipe_id, source)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe):
+    if not recipe.image or variants_ready(recipe):
+        return
+    args = (recipe.pk, recipe.image.name)
+    if settings.IMAGE_VARIANT_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(
+            generate_variants_in_worker, *args
+        ))
+    else:
+        transaction.on_commit(lambda: try_generate_variants(*args))
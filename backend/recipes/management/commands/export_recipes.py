@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management import BaseCommand
+from recipes.catalog import CATALOG_CHUNK_SIZE, export_recipes, stream_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог рецептов в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default='-')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CATALOG_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        output = (
+            sys.stdout if path == '-'
+            else open(path, 'wt', encoding='utf-8')
+        )
+        total = 0
+        try:
+            for line in stream_ndjson(export_recipes(kwargs['chunk_size'])):
+                output.write(line)
+                total += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(f'Выгружено рецептов: {total}')
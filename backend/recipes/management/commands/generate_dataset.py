@@ -0,0 +1,83 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from recipes.dataset import generate_dataset
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетический набор данных для нагрузочного '
+        'тестирования: пользователей, рецепты, подписки, избранное '
+        'и корзины'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX'),
+            help='Количество ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число избранных рецептов пользователя'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Средний размер корзины'
+        )
+        parser.add_argument(
+            '--heavy-carts', type=int, default=5,
+            help='Число пользователей с огромными корзинами'
+        )
+        parser.add_argument('--heavy-cart-size', type=int, default=300)
+        parser.add_argument(
+            '--author-skew', type=float, default=1.1,
+            help='Показатель Zipf для распределения рецептов по авторам'
+        )
+        parser.add_argument(
+            '--follow-skew', type=float, default=1.2,
+            help='Показатель Zipf для подписок на популярных авторов'
+        )
+        parser.add_argument(
+            '--favorite-skew', type=float, default=1.1,
+            help='Показатель Zipf для избранного и корзин'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', type=str, default='load')
+        parser.add_argument(
+            '--password', type=str, default='loadtest-password',
+            help='Пароль всех сгенерированных пользователей'
+        )
+        parser.add_argument(
+            '--no-feeds', dest='feeds', action='store_false',
+            help='Не заполнять ленты подписок'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно минимум 2 пользователя и 1 рецепт')
+        prefix = options['prefix']
+        if User.objects.filter(email=f'{prefix}0@example.com').exists():
+            raise CommandError(
+                f'Набор с префиксом {prefix} уже создан, укажите --prefix'
+            )
+        started = time.monotonic()
+        user_ids, recipe_ids = generate_dataset(
+            options,
+            lambda message: self.stdout.write(
+                f'[{time.monotonic() - started:.1f} с] {message}'
+            )
+        )
+        self.stdout.write(
+            f'Готово: {len(user_ids)} пользователей, '
+            f'{len(recipe_ids)} рецептов за '
+            f'{time.monotonic() - started:.1f} с'
+        )
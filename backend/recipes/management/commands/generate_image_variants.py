@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from recipes.images import generate_variants, variants_ready
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные варианты изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true')
+
+    def handle(self, *args, **kwargs):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None).only(
+            'id', 'image', 'image_variants'
+        )
+        generated = 0
+        for recipe in recipes.iterator():
+            if kwargs['force'] or not variants_ready(recipe):
+                generate_variants(recipe.pk, recipe.image.name)
+                generated += 1
+        self.stdout.write(f'Подготовлено изображений: {generated}')
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+from recipes.catalog import CATALOG_CHUNK_SIZE, import_recipes, read_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает каталог рецептов из NDJSON. Рецепты сопоставляются по '
+        'uid, авторы ищутся по email, теги по slug, ингредиенты по '
+        'названию и единице измерения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default='-')
+        parser.add_argument(
+            '--batch-size', type=int, default=CATALOG_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        source = (
+            sys.stdin if path == '-' else open(path, 'rt', encoding='utf-8')
+        )
+        started = time.monotonic()
+        try:
+            stats = import_recipes(
+                read_ndjson(source), kwargs['batch_size']
+            )
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Некорректная запись каталога: {error}')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.monotonic() - started
+        total = stats['total']
+        self.stdout.write(
+            f'Обработано рецептов: {total}, добавлено: {stats["imported"]}, '
+            f'пропущено: {total - stats["imported"]} '
+            f'(уже загружены: {stats["duplicates"]}, '
+            f'неизвестные авторы: {stats["unknown_authors"]}), '
+            f'{total / elapsed if elapsed else total:.0f} рецептов/с'
+        )
@@ -1,20 +1,230 @@
 import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
+from recipes.versions import bump_version
+
+COPY_SQL = (
+    'CREATE TEMPORARY TABLE ingredient_staging '
+    '(name varchar(100), measurement_unit varchar(30)) ON COMMIT DROP;'
+)
+COPY_FROM_SQL = 'COPY ingredient_staging FROM STDIN WITH (FORMAT csv)'
+COPY_MERGE_SQL = (
+    'INSERT INTO {table} (name, measurement_unit) '
+    'SELECT DISTINCT name, measurement_unit FROM ingredient_staging '
+    'ON CONFLICT (name, measurement_unit) DO NOTHING'
+)
+JSON_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+
+def read_csv(path):
+    with open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, dialect='excel')
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != 2:
+                raise CommandError(
+                    f'Строка {reader.line_num}: ожидалось 2 поля '
+                    f'(название, единица измерения), получено {len(row)}'
+                )
+            yield row[0], row[1]
+
+
+def ingredient_fields(item, position):
+    try:
+        return item['name'], item['measurement_unit']
+    except (KeyError, TypeError):
+        raise CommandError(
+            f'Элемент {position}: ожидался объект с полями '
+            f'name и measurement_unit'
+        )
+
+
+class JSONArrayReader:
+
+    def __init__(self, f):
+        self.file = f
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.position, self.eof = '', 0, False
+
+    def read_more(self):
+        if self.eof:
+            raise ValueError('файл оборвался до конца массива')
+        chunk = self.file.read(JSON_CHUNK_SIZE)
+        self.eof = len(chunk) < JSON_CHUNK_SIZE
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        while True:
+            self.position = WHITESPACE.match(
+                self.buffer, self.position
+            ).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            self.read_more()
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f'ожидалось одно из {chars!r}, найдено {char!r}')
+        self.position += 1
+        return char
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                item, self.position = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+                return item
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.read_more()
+
+    def __iter__(self):
+        self.expect('[')
+        if self.peek() == ']':
+            return
+        while True:
+            yield self.decode()
+            if self.expect(',]') == ']':
+                return
+
+
+def read_json(path):
+    with open(path, 'rt', encoding='utf-8') as f:
+        position = 0
+        try:
+            for position, item in enumerate(JSONArrayReader(f), 1):
+                yield ingredient_fields(item, position)
+        except ValueError as error:
+            raise CommandError(
+                f'Некорректный JSON после элемента {position}: {error}'
+            )
+
+
+def read_ndjson(path):
+    with open(path, 'rt', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {number}: {error}')
+            yield ingredient_fields(item, number)
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+class CSVStream(io.RawIOBase):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.leftover = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while len(self.leftover) < len(target):
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(row)
+            self.leftover += self.buffer.getvalue().encode('utf-8')
+            self.buffer.seek(0)
+            self.buffer.truncate()
+        size = min(len(target), len(self.leftover))
+        target[:size] = self.leftover[:size]
+        self.leftover = self.leftover[size:]
+        return size
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV, JSON или NDJSON файла'
 
     def add_arguments(self, parser):
-        parser.add_argument('--path', type=str)
+        parser.add_argument('--path', type=str, required=True)
+        parser.add_argument('--format', choices=READERS.keys())
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузка через COPY во временную таблицу (PostgreSQL)'
+        )
+
+    def load_batches(self, rows, batch_size):
+        total = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return total
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ],
+                ignore_conflicts=True
+            )
+            total += len(batch)
+
+    def load_copy(self, rows):
+        if connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL')
+        counted = {'total': 0}
+
+        def count(rows):
+            for row in rows:
+                counted['total'] += 1
+                yield row
+
+        with connection.cursor() as cursor:
+            cursor.execute(COPY_SQL)
+            cursor.copy_expert(COPY_FROM_SQL, CSVStream(count(rows)))
+            cursor.execute(
+                COPY_MERGE_SQL.format(table=Ingredient._meta.db_table)
+            )
+        return counted['total']
 
     def handle(self, *args, **kwargs):
         path = kwargs['path']
-        with open(path, 'rt') as f:
-            reader = csv.reader(f, dialect='excel')
-            for row in reader:
-                Ingredient.objects.create(
-                    name=row[0],
-                    measurement_unit=row[1],
-                )
+        file_format = (
+            kwargs['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        rows = READERS[file_format](path)
+        started = time.monotonic()
+        existing = Ingredient.objects.count()
+        with transaction.atomic():
+            if kwargs['copy']:
+                total = self.load_copy(rows)
+            else:
+                total = self.load_batches(rows, kwargs['batch_size'])
+            bump_version('ingredients')
+        created = Ingredient.objects.count() - existing
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Обработано строк: {total}, добавлено: {created}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+        )
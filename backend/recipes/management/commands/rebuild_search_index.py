@@ -0,0 +1,15 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from recipes.search import install_search
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает триггеры полнотекстового поиска '
+        'и переиндексирует рецепты'
+    )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            install_search(connection)
+        self.stdout.write(f'Поисковый индекс перестроен ({connection.vendor})')
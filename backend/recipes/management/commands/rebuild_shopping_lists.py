@@ -0,0 +1,44 @@
+from django.core.management import BaseCommand, CommandError
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает списки покупок пользователей по их корзинам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append')
+        parser.add_argument('--verify', action='store_true')
+
+    def handle(self, *args, **kwargs):
+        user_ids = kwargs['user']
+        if not kwargs['verify']:
+            ShoppingListItem.objects.rebuild(user_ids)
+            self.stdout.write('Списки покупок пересчитаны')
+            return
+        items = ShoppingListItem.objects.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in items.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        live = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.live(user_ids)
+        }
+        mismatches = sorted(
+            key for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)
+        )
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингридиент {ingredient_id}: '
+                f'сохранено {stored.get((user_id, ingredient_id))}, '
+                f'по корзине {live.get((user_id, ingredient_id))}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write('Списки покупок совпадают с корзинами')
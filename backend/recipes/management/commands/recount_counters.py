@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, рецептов и подписчиков'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            broken = recount_all()
+        for field, total in broken.items():
+            self.stdout.write(f'{field}: исправлено записей {total}')
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from recipes.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из лент подписок записи сверх FEED_MAX_ITEMS '
+        'на пользователя. Публикация рецепта ленты не обрезает, '
+        'поэтому команду нужно запускать периодически'
+    )
+
+    def handle(self, *args, **kwargs):
+        deleted = FeedItem.objects.trim()
+        self.stdout.write(
+            f'Удалено записей: {deleted} '
+            f'(лимит {settings.FEED_MAX_ITEMS} на пользователя)'
+        )
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.13 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+FILL_FEEDS_SQL = """
+INSERT INTO {feed} (user_id, recipe_id, created_at)
+SELECT user_id, recipe_id, created_at FROM (
+    SELECT follow.user_id, recipe.id AS recipe_id, recipe.created_at,
+           ROW_NUMBER() OVER (
+               PARTITION BY follow.user_id
+               ORDER BY recipe.created_at DESC, recipe.id DESC
+           ) AS position
+    FROM {follow} follow
+    JOIN {recipe} recipe ON recipe.author_id = follow.author_id
+    WHERE follow.author_id NOT IN (
+        SELECT author_id FROM {follow}
+        GROUP BY author_id HAVING COUNT(*) > %s
+    )
+) ranked
+WHERE position <= %s
+"""
+
+
+def fill_feeds(apps, schema_editor):
+    tables = {
+        name: apps.get_model('recipes', model)._meta.db_table
+        for name, model in (
+            ('feed', 'FeedItem'), ('follow', 'Follow'), ('recipe', 'Recipe')
+        )
+    }
+    schema_editor.execute(
+        FILL_FEEDS_SQL.format(**tables),
+        (settings.FEED_FANOUT_MAX_FOLLOWERS, settings.FEED_MAX_ITEMS)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Дата публикации')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='feed_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:05
+
+from django.db import migrations
+
+SEARCH_CONFIG = 'pg_catalog.russian'
+SEARCH_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_INSTALL = (
+    f'ALTER TABLE {SEARCH_TABLE} '
+    'ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    f'CREATE INDEX IF NOT EXISTS recipe_search_idx '
+    f'ON {SEARCH_TABLE} USING gin (search_vector)',
+    f"""
+    CREATE OR REPLACE FUNCTION recipe_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f'DROP TRIGGER IF EXISTS recipe_search_vector ON {SEARCH_TABLE}',
+    f'CREATE TRIGGER recipe_search_vector '
+    f'BEFORE INSERT OR UPDATE OF name, text ON {SEARCH_TABLE} '
+    'FOR EACH ROW EXECUTE PROCEDURE recipe_search_vector()',
+)
+POSTGRESQL_REBUILD = f'UPDATE {SEARCH_TABLE} SET name = name'
+POSTGRESQL_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS recipe_search_vector ON {SEARCH_TABLE}',
+    'DROP FUNCTION IF EXISTS recipe_search_vector()',
+    f'ALTER TABLE {SEARCH_TABLE} DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_INSTALL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    f"name, text, content='{SEARCH_TABLE}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert '
+    f'AFTER INSERT ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete '
+    f'AFTER DELETE ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update '
+    f'AFTER UPDATE OF name, text ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+)
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+SQLITE_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+BACKENDS = {
+    'postgresql': (
+        POSTGRESQL_INSTALL, POSTGRESQL_REBUILD, POSTGRESQL_UNINSTALL
+    ),
+    'sqlite': (SQLITE_INSTALL, SQLITE_REBUILD, SQLITE_UNINSTALL),
+}
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in BACKENDS:
+        install_sql, rebuild_sql, _ = BACKENDS[vendor]
+        for sql in (*install_sql, rebuild_sql):
+            schema_editor.execute(sql, params=None)
+
+
+def uninstall(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in BACKENDS:
+        for sql in BACKENDS[vendor][2]:
+            schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
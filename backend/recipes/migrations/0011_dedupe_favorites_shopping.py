@@ -0,0 +1,74 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def delete_duplicates(model):
+    duplicates = model.objects.values('user_id', 'recipe_id').annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    affected = []
+    for duplicate in duplicates:
+        model.objects.filter(
+            user_id=duplicate['user_id'], recipe_id=duplicate['recipe_id']
+        ).exclude(id=duplicate['keep_id']).delete()
+        affected.append(duplicate)
+    return affected
+
+
+def dedupe_favorites_shopping(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Shopping = apps.get_model('recipes', 'Shopping')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    recipe_ids = {
+        duplicate['recipe_id'] for duplicate in delete_duplicates(Favorite)
+    }
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        favorites_count=Coalesce(
+            models.Subquery(
+                Favorite.objects.filter(
+                    recipe=models.OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ),
+            0
+        )
+    )
+    user_ids = {
+        duplicate['user_id'] for duplicate in delete_duplicates(Shopping)
+    }
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    rows = Shopping.objects.filter(
+        user_id__in=user_ids, recipe__recipeingredientqty__isnull=False
+    ).values_list(
+        'user_id', 'recipe__recipeingredientqty__ingredient_id'
+    ).annotate(
+        total=models.Sum('recipe__recipeingredientqty__amount')
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, ingredient_id, amount in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            dedupe_favorites_shopping, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-18 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipeingredientqty',
+            name='amount',
+            field=models.PositiveSmallIntegerField(verbose_name='Количество в рецепте'),
+        ),
+    ]
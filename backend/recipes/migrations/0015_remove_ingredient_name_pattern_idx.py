@@ -0,0 +1,17 @@
+# Generated by Django 3.2.13 on 2026-10-18 20:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_pattern_idx',
+        ),
+    ]
@@ -0,0 +1,46 @@
+import uuid
+
+from django.db import migrations, models
+
+UID_BATCH_SIZE = 2000
+
+
+def fill_uids(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = []
+    for recipe in Recipe.objects.filter(uid__isnull=True).only('id').iterator(
+        chunk_size=UID_BATCH_SIZE
+    ):
+        recipe.uid = uuid.uuid4()
+        recipes.append(recipe)
+        if len(recipes) == UID_BATCH_SIZE:
+            Recipe.objects.bulk_update(recipes, ['uid'])
+            recipes = []
+    Recipe.objects.bulk_update(recipes, ['uid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_remove_ingredient_name_pattern_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='uid',
+            field=models.UUIDField(
+                editable=False, null=True,
+                verbose_name='Внешний идентификатор'
+            ),
+        ),
+        migrations.RunPython(fill_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='uid',
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, unique=True,
+                verbose_name='Внешний идентификатор'
+            ),
+        ),
+    ]
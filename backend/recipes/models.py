@@ -1,6 +1,36 @@
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
-from users.models import User
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from users.models import CountersModelMixin, User
+
+RELATION_INSERT_SQL = (
+    'INSERT INTO {table} ({user}, {target}) VALUES {values} '
+    'ON CONFLICT DO NOTHING RETURNING {target}'
+)
+SQLITE_RETURNING_VERSION = (3, 35)
+
+
+def ranked_ids(queryset, partition_by, comparison, limit):
+    ranked = queryset.annotate(
+        row_number=models.Window(
+            expression=RowNumber(),
+            partition_by=[models.F(partition_by)],
+            order_by=[
+                models.F('created_at').desc(),
+                models.F('id').desc(),
+            ]
+        )
+    ).order_by().values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    return RawSQL(
+        f'SELECT id FROM ({sql}) ranked WHERE row_number {comparison} %s',
+        (*params, limit)
+    )
 
 
 class Tag(models.Model):
@@ -41,20 +71,88 @@ class Ingredient(models.Model):
 
     class Meta:
         verbose_name = 'Ингридиент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredientqty_set',
+                queryset=RecipeIngredientQty.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def set_created_at(self, values):
+        if not values:
+            return
+        self.filter(id__in=values).update(created_at=models.Case(
+            *(
+                models.When(id=recipe_id, then=models.Value(value))
+                for recipe_id, value in values.items()
+            ),
+            output_field=models.DateTimeField()
+        ))
+
+    def latest_per_author(self, limit):
+        return self.filter(id__in=ranked_ids(self, 'author_id', '<=', limit))
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(Shopping.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+        )
+
 
+class Recipe(CountersModelMixin, models.Model):
+
+    uid = models.UUIDField(
+        'Внешний идентификатор',
+        default=uuid.uuid4,
+        unique=True,
+        editable=False
+    )
     name = models.CharField('Название', max_length=200)
     text = models.TextField('Описание', max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     image = models.ImageField(
         'Изображение',
         null=True
     )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное',
+        default=0,
+        editable=False
+    )
     cooking_time = models.IntegerField(
         'Время готовки, мин.',
         validators=[
@@ -78,16 +176,34 @@ class Recipe(models.Model):
         verbose_name='Ингридиенты'
     )
 
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count',)
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=('-created_at', '-id'),
+                name='recipe_created_idx'
+            ),
+            models.Index(
+                fields=('author', '-created_at', '-id'),
+                name='recipe_author_created_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.author.username})'
 
     def get_favorited_count(self):
-        return self.favorites.count()
+        return self.favorites_count
+
+    def ingredient_amounts(self):
+        return dict(
+            self.recipeingredientqty_set.values_list('ingredient_id', 'amount')
+        )
 
 
 class RecipeIngredientQty(models.Model):
@@ -116,6 +232,62 @@ class RecipeIngredientQty(models.Model):
         ]
 
 
+class RelationQuerySet(models.QuerySet):
+
+    def returns_inserted(self):
+        connection = connections[self.db]
+        return connection.vendor == 'postgresql' or (
+            connection.vendor == 'sqlite'
+            and connection.Database.sqlite_version_info
+            >= SQLITE_RETURNING_VERSION
+        )
+
+    def insert_returning(self, user, target_ids):
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        target = quote(meta.get_field(self.model.target_field).column)
+        sql = RELATION_INSERT_SQL.format(
+            table=quote(meta.db_table),
+            user=quote(meta.get_field('user').column),
+            target=target,
+            values=', '.join(['(%s, %s)'] * len(target_ids)),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                value for target_id in target_ids
+                for value in (user.pk, target_id)
+            ])
+            return {target_id for target_id, in cursor.fetchall()}
+
+    def add(self, user, target_ids):
+        target_ids = set(target_ids)
+        if not target_ids:
+            return target_ids
+        if self.returns_inserted():
+            return self.insert_returning(user, target_ids)
+        target_field = self.model.target_field
+        target_ids -= set(self.filter(
+            user=user, **{f'{target_field}__in': target_ids}
+        ).values_list(target_field, flat=True))
+        self.bulk_create(
+            [
+                self.model(user=user, **{target_field: target_id})
+                for target_id in target_ids
+            ],
+            ignore_conflicts=True
+        )
+        return target_ids
+
+    def remove(self, user, target_ids):
+        target_field = self.model.target_field
+        rows = self.filter(user=user, **{f'{target_field}__in': target_ids})
+        target_ids = set(rows.values_list(target_field, flat=True))
+        if target_ids:
+            rows.delete()
+        return target_ids
+
+
 class Favorite(models.Model):
 
     recipe = models.ForeignKey(
@@ -131,8 +303,17 @@ class Favorite(models.Model):
         verbose_name='Пользователь'
     )
 
+    objects = RelationQuerySet.as_manager()
+    target_field = 'recipe_id'
+
     class Meta:
         verbose_name = 'Избранный рецепт'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite'
+            )
+        ]
 
     def __str__(self):
         return (
@@ -156,8 +337,137 @@ class Shopping(models.Model):
         verbose_name='Пользователь'
     )
 
+    objects = RelationQuerySet.as_manager()
+    target_field = 'recipe_id'
+
     class Meta:
         verbose_name = 'Рецепт в корзине'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping'
+            )
+        ]
+
+
+class ShoppingListQuerySet(models.QuerySet):
+
+    def apply_delta(self, user_ids, deltas):
+        user_ids = set(user_ids)
+        deltas = {
+            ingredient_id: amount
+            for ingredient_id, amount in deltas.items() if amount
+        }
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for user_id in user_ids for ingredient_id in deltas
+                ],
+                ignore_conflicts=True
+            )
+            self.filter(
+                user_id__in=user_ids, ingredient_id__in=deltas
+            ).update(amount=models.F('amount') + models.Case(
+                *(
+                    models.When(ingredient_id=ingredient_id, then=amount)
+                    for ingredient_id, amount in deltas.items()
+                ),
+                default=0,
+                output_field=models.IntegerField()
+            ))
+            self.filter(user_id__in=user_ids, amount__lte=0).delete()
+
+    def add_recipes(self, user, recipe_ids, sign=1):
+        if not recipe_ids:
+            return
+        amounts = RecipeIngredientQty.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id').annotate(
+            total=models.Sum('amount')
+        ).order_by()
+        self.apply_delta(
+            [user.id],
+            {ingredient_id: sign * total for ingredient_id, total in amounts}
+        )
+
+    def remove_recipes(self, user, recipe_ids):
+        self.add_recipes(user, recipe_ids, sign=-1)
+
+    def change_recipe(self, recipe, old_amounts, new_amounts=None):
+        if new_amounts is None:
+            new_amounts = recipe.ingredient_amounts()
+        deltas = dict(new_amounts)
+        for ingredient_id, amount in old_amounts.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+        self.apply_delta(
+            Shopping.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            deltas
+        )
+
+    def live(self, user_ids=None):
+        shopping = Shopping.objects.filter(
+            recipe__recipeingredientqty__isnull=False
+        )
+        if user_ids is not None:
+            shopping = shopping.filter(user_id__in=user_ids)
+        return shopping.values_list(
+            'user_id',
+            'recipe__recipeingredientqty__ingredient_id',
+        ).annotate(
+            total=models.Sum('recipe__recipeingredientqty__amount')
+        ).order_by()
+
+    def rebuild(self, user_ids=None):
+        with transaction.atomic():
+            items = self.all()
+            if user_ids is not None:
+                items = items.filter(user_id__in=user_ids)
+            items.delete()
+            self.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for user_id, ingredient_id, amount in self.live(user_ids)
+                ],
+                batch_size=1000
+            )
+
+
+class ShoppingListItem(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингридиент'
+    )
+    amount = models.IntegerField('Количество')
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient'
+            )
+        ]
 
 
 class Follow(models.Model):
@@ -175,6 +485,9 @@ class Follow(models.Model):
         verbose_name='Автор, на которого подписались'
     )
 
+    objects = RelationQuerySet.as_manager()
+    target_field = 'author_id'
+
     def __str__(self):
         return (
             f'Подписчик: {self.user.get_full_name()} - '
@@ -193,3 +506,135 @@ class Follow(models.Model):
                 name='restric_self_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            )
+        ]
+
+
+class FeedQuerySet(models.QuerySet):
+
+    def add_recipes(self, user_ids, recipes):
+        self.bulk_create(
+            [
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    created_at=created_at
+                )
+                for user_id in user_ids
+                for recipe_id, created_at in recipes
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def fan_out(self, recipe):
+        self.fan_out_recipes(
+            [(recipe.id, recipe.author_id, recipe.created_at)]
+        )
+
+    def fan_out_recipes(self, recipes):
+        recipes = list(recipes)
+        author_ids = {author_id for _, author_id, _ in recipes}
+        User.objects.filter(
+            id__in=author_ids,
+            feed_pulled=False,
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).update(feed_pulled=True)
+        followers = defaultdict(list)
+        for author_id, user_id in Follow.objects.filter(
+            author_id__in=author_ids, author__feed_pulled=False
+        ).values_list('author_id', 'user_id'):
+            followers[author_id].append(user_id)
+        self.bulk_create(
+            [
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    created_at=created_at
+                )
+                for recipe_id, author_id, created_at in recipes
+                for user_id in followers[author_id]
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def follow(self, user, author_ids):
+        if not author_ids:
+            return
+        self.add_recipes(
+            [user.id],
+            Recipe.objects.filter(
+                author_id__in=author_ids, author__feed_pulled=False
+            ).order_by('-created_at', '-id').values_list(
+                'id', 'created_at'
+            )[:settings.FEED_MAX_ITEMS]
+        )
+        self.trim([user.id])
+
+    def unfollow(self, user, author_ids):
+        if author_ids:
+            self.filter(
+                user=user, recipe__author_id__in=author_ids
+            ).delete()
+
+    def trim(self, user_ids=None):
+        items = self.all()
+        if user_ids is not None:
+            if not user_ids:
+                return 0
+            items = items.filter(user_id__in=user_ids)
+        return items.filter(id__in=ranked_ids(
+            items, 'user_id', '>', settings.FEED_MAX_ITEMS
+        )).delete()[0]
+
+
+class FeedItem(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    created_at = models.DateTimeField('Дата публикации')
+
+    objects = FeedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created_at', '-id'),
+                name='feed_user_created_idx'
+            )
+        ]
+
+
+class Version(models.Model):
+
+    name = models.CharField(
+        'Название',
+        max_length=50,
+        primary_key=True
+    )
+    value = models.BigIntegerField('Значение')
+
+    class Meta:
+        verbose_name = 'Версия данных'
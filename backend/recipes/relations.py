@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import transaction
+from users.models import User
+
+from .counters import change_counters
+from .models import (Favorite, FeedItem, Follow, Recipe, Shopping,
+                     ShoppingListItem)
+
+explicit = ContextVar('explicit_side_effects', default=False)
+
+
+@contextmanager
+def explicit_side_effects():
+    token = explicit.set(True)
+    try:
+        yield
+    finally:
+        explicit.reset(token)
+
+
+def side_effects_applied():
+    return explicit.get()
+
+
+def rebuild_shopping_lists(user_ids):
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(
+            lambda: ShoppingListItem.objects.rebuild(user_ids)
+        )
+
+
+def lock_user(user):
+    User.objects.select_for_update().filter(pk=user.pk).exists()
+
+
+def relation_change(func):
+    @wraps(func)
+    def wrapper(user, target_ids):
+        with transaction.atomic(), explicit_side_effects():
+            lock_user(user)
+            return func(user, target_ids)
+    return wrapper
+
+
+@relation_change
+def add_favorites(user, recipe_ids):
+    added = Favorite.objects.add(user, recipe_ids)
+    change_counters(Recipe, added, 'favorites_count', 1)
+    return added
+
+
+@relation_change
+def remove_favorites(user, recipe_ids):
+    removed = Favorite.objects.remove(user, recipe_ids)
+    change_counters(Recipe, removed, 'favorites_count', -1)
+    return removed
+
+
+@relation_change
+def add_to_cart(user, recipe_ids):
+    added = Shopping.objects.add(user, recipe_ids)
+    ShoppingListItem.objects.add_recipes(user, added)
+    return added
+
+
+@relation_change
+def remove_from_cart(user, recipe_ids):
+    removed = Shopping.objects.remove(user, recipe_ids)
+    ShoppingListItem.objects.remove_recipes(user, removed)
+    return removed
+
+
+@relation_change
+def follow_authors(user, author_ids):
+    added = Follow.objects.add(user, set(author_ids) - {user.pk})
+    change_counters(User, added, 'followers_count', 1)
+    FeedItem.objects.follow(user, added)
+    return added
+
+
+@relation_change
+def unfollow_authors(user, author_ids):
+    removed = Follow.objects.remove(user, author_ids)
+    change_counters(User, removed, 'followers_count', -1)
+    FeedItem.objects.unfollow(user, removed)
+    return removed
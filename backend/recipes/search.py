@@ -0,0 +1,144 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'pg_catalog.russian'
+SEARCH_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_INSTALL = (
+    f'ALTER TABLE {SEARCH_TABLE} '
+    'ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    f'CREATE INDEX IF NOT EXISTS recipe_search_idx '
+    f'ON {SEARCH_TABLE} USING gin (search_vector)',
+    f"""
+    CREATE OR REPLACE FUNCTION recipe_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f'DROP TRIGGER IF EXISTS recipe_search_vector ON {SEARCH_TABLE}',
+    f'CREATE TRIGGER recipe_search_vector '
+    f'BEFORE INSERT OR UPDATE OF name, text ON {SEARCH_TABLE} '
+    'FOR EACH ROW EXECUTE PROCEDURE recipe_search_vector()',
+)
+POSTGRESQL_REBUILD = f'UPDATE {SEARCH_TABLE} SET name = name'
+POSTGRESQL_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS recipe_search_vector ON {SEARCH_TABLE}',
+    'DROP FUNCTION IF EXISTS recipe_search_vector()',
+    f'ALTER TABLE {SEARCH_TABLE} DROP COLUMN IF EXISTS search_vector',
+)
+POSTGRESQL_MATCH = (
+    f'SELECT id FROM {SEARCH_TABLE} WHERE search_vector @@ '
+    f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+)
+POSTGRESQL_RANK = (
+    f'ts_rank({SEARCH_TABLE}.search_vector, '
+    f"websearch_to_tsquery('{SEARCH_CONFIG}', %s))"
+)
+
+SQLITE_INSTALL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    f"name, text, content='{SEARCH_TABLE}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert '
+    f'AFTER INSERT ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete '
+    f'AFTER DELETE ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update '
+    f'AFTER UPDATE OF name, text ON {SEARCH_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+)
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+SQLITE_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+SQLITE_INSTALLED = (
+    "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s"
+)
+SQLITE_TRIGGERS = (
+    "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+    'AND tbl_name = %s AND name LIKE %s'
+)
+SQLITE_MATCH = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+SQLITE_RANK = (
+    f'(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s '
+    f'AND rowid = {SEARCH_TABLE}.id)'
+)
+
+BACKENDS = {
+    'postgresql': (
+        POSTGRESQL_INSTALL, POSTGRESQL_REBUILD, POSTGRESQL_UNINSTALL,
+        POSTGRESQL_MATCH, POSTGRESQL_RANK,
+    ),
+    'sqlite': (
+        SQLITE_INSTALL, SQLITE_REBUILD, SQLITE_UNINSTALL,
+        SQLITE_MATCH, SQLITE_RANK,
+    ),
+}
+
+
+def install_search(connection):
+    if connection.vendor not in BACKENDS:
+        return
+    install, rebuild, *_ = BACKENDS[connection.vendor]
+    with connection.cursor() as cursor:
+        for sql in (*install, rebuild):
+            cursor.execute(sql)
+
+
+def uninstall_search(connection):
+    if connection.vendor not in BACKENDS:
+        return
+    with connection.cursor() as cursor:
+        for sql in BACKENDS[connection.vendor][2]:
+            cursor.execute(sql)
+
+
+def restore_search(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SQLITE_INSTALLED, (FTS_TABLE,))
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(SQLITE_TRIGGERS, (SEARCH_TABLE, f'{FTS_TABLE}_%'))
+        if cursor.fetchone()[0] == len(SQLITE_INSTALL) - 1:
+            return
+    install_search(connection)
+
+
+def fts5_query(query):
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def search_recipes(queryset, query):
+    vendor = connections[queryset.db].vendor
+    if vendor not in BACKENDS or not query.split():
+        return queryset.filter(name__icontains=query.strip())
+    *_, match_sql, rank_sql = BACKENDS[vendor]
+    if vendor == 'sqlite':
+        query = fts5_query(query)
+    return queryset.filter(
+        id__in=RawSQL(match_sql, (query,))
+    ).annotate(
+        search_rank=RawSQL(rank_sql, (query,))
+    ).order_by('-search_rank', '-created_at', '-id')
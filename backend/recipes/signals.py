@@ -0,0 +1,82 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from users.models import User
+
+from .counters import change_counter
+from .images import schedule_variants
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredientQty,
+                     Shopping, Tag)
+from .relations import rebuild_shopping_lists, side_effects_applied
+from .versions import bump_version
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+    bump_version('recipes')
+    schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+    bump_version('recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, **kwargs):
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=RecipeIngredientQty)
+@receiver(post_delete, sender=RecipeIngredientQty)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_version('recipes')
+    if not side_effects_applied():
+        rebuild_shopping_lists(Shopping.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Shopping)
+@receiver(post_delete, sender=Shopping)
+def shopping_changed(sender, instance, **kwargs):
+    if not side_effects_applied():
+        rebuild_shopping_lists([instance.user_id])
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_saved(sender, instance, created, **kwargs):
+    if created and not side_effects_applied():
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    if not side_effects_applied():
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created and not side_effects_applied():
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if not side_effects_applied():
+        change_counter(User, instance.author_id, 'followers_count', -1)
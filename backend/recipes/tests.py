@@ -0,0 +1,360 @@
+import io
+import json
+import tempfile
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+from users.models import User
+
+from .catalog import export_recipes, import_recipes
+from .dataset import PLACEHOLDER_IMAGE
+from .models import (Favorite, FeedItem, Follow, Ingredient, Recipe,
+                     RecipeIngredientQty, Shopping, ShoppingListItem, Tag)
+from .relations import add_favorites, remove_favorites
+from .search import FTS_TABLE, restore_search, search_recipes
+
+POSTGRESQL_INDEX_NODES = (
+    'Index Scan', 'Index Only Scan', 'Bitmap Index Scan',
+)
+
+
+class ShoppingListSignalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/test.png'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.row = RecipeIngredientQty.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=100
+        )
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_admin_edits_rebuild_shopping_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shopping = Shopping.objects.create(
+                user=self.user, recipe=self.recipe
+            )
+        self.assertEqual(self.shopping_list(), {self.ingredient.id: 100})
+        self.row.amount = 250
+        with self.captureOnCommitCallbacks(execute=True):
+            self.row.save()
+        self.assertEqual(self.shopping_list(), {self.ingredient.id: 250})
+        with self.captureOnCommitCallbacks(execute=True):
+            shopping.delete()
+        self.assertEqual(self.shopping_list(), {})
+
+
+class RelationCountersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='password'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {i}', text='Текст',
+                cooking_time=5, image='recipes/test.png'
+            )
+            for i in range(3)
+        ]
+
+    def favorites_counts(self):
+        return list(Recipe.objects.order_by('id').values_list(
+            'favorites_count', flat=True
+        ))
+
+    def check_counters(self):
+        ids = [recipe.id for recipe in self.recipes]
+        self.assertEqual(add_favorites(self.user, ids[:2]), set(ids[:2]))
+        self.assertEqual(add_favorites(self.user, ids), {ids[2]})
+        self.assertEqual(self.favorites_counts(), [1, 1, 1])
+        self.assertEqual(remove_favorites(self.user, ids[1:]), set(ids[1:]))
+        self.assertEqual(remove_favorites(self.user, ids[1:]), set())
+        self.assertEqual(self.favorites_counts(), [1, 0, 0])
+        Favorite.objects.get(user=self.user).delete()
+        self.assertEqual(self.favorites_counts(), [0, 0, 0])
+
+    def test_counters_are_applied_once(self):
+        self.check_counters()
+
+    def test_counters_without_returning(self):
+        with mock.patch(
+            'recipes.models.RelationQuerySet.returns_inserted',
+            return_value=False
+        ):
+            self.check_counters()
+
+
+class CatalogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='password'
+        )
+        for text in ('Первый', 'Второй'):
+            recipe = Recipe.objects.create(
+                author=cls.author, name='Борщ', text=text, cooking_time=5,
+                image='recipes/test.png'
+            )
+            RecipeIngredientQty.objects.create(
+                recipe=recipe, amount=100,
+                ingredient=Ingredient.objects.create(
+                    name=f'Свекла {text}', measurement_unit='г'
+                )
+            )
+
+    def test_recipes_are_matched_by_uid(self):
+        records = list(export_recipes())
+        stranger = dict(records[0], uid=str(uuid.uuid4()), author='x@x.ru')
+        Recipe.objects.all().delete()
+        stats = import_recipes(records + records + [stranger])
+        self.assertEqual(stats['total'], 5)
+        self.assertEqual(stats['imported'], 2)
+        self.assertEqual(stats['duplicates'], 2)
+        self.assertEqual(stats['unknown_authors'], 1)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('name', 'text')),
+            [('Борщ', 'Второй'), ('Борщ', 'Первый')]
+        )
+        self.assertEqual(list(export_recipes()), records)
+        self.assertEqual(import_recipes(records)['duplicates'], 2)
+
+    def test_tag_conflicts_are_reported(self):
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        record = dict(
+            next(export_recipes()), uid=str(uuid.uuid4()),
+            tags=[{'slug': 'dinner', 'name': 'Обед', 'color': '#8775D2'}]
+        )
+        with self.assertRaisesMessage(ValueError, 'уже занят тегом lunch'):
+            import_recipes([record])
+        record['tags'] = [
+            {'slug': 'lunch', 'name': 'Обед', 'color': '#49B64E'},
+            {'slug': 'dinner', 'name': 'Ужин', 'color': '#8775D2'},
+        ]
+        self.assertEqual(import_recipes([record])['imported'], 1)
+        self.assertEqual(
+            sorted(Recipe.objects.get(uid=record['uid']).tags.values_list(
+                'slug', flat=True
+            )),
+            ['dinner', 'lunch']
+        )
+
+
+class GenerateDatasetTests(TestCase):
+
+    def test_dataset_survives_existing_names(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='password'
+        )
+        Recipe.objects.create(
+            author=author, name='load рецепт 0', text='Текст',
+            cooking_time=5, image='recipes/test.png'
+        )
+        with tempfile.TemporaryDirectory() as media_root:
+            with self.settings(MEDIA_ROOT=media_root):
+                call_command(
+                    'generate_dataset', users=4, recipes=6, batch_size=4,
+                    stdout=io.StringIO()
+                )
+            self.assertTrue(Path(media_root, PLACEHOLDER_IMAGE).is_file())
+        self.assertEqual(
+            Recipe.objects.filter(name='load рецепт 0').count(), 2
+        )
+        self.assertEqual(Recipe.objects.filter(
+            image=PLACEHOLDER_IMAGE
+        ).count(), 6)
+        self.assertFalse(RecipeIngredientQty.objects.filter(
+            recipe__author=author
+        ).exists())
+
+
+class LoadIngredientsTests(TestCase):
+
+    def load(self, name, content):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, name)
+            path.write_text(content, encoding='utf-8')
+            call_command(
+                'load_ingredients', path=str(path), stdout=io.StringIO()
+            )
+
+    def test_json_is_read_incrementally(self):
+        items = [
+            {'name': f'Ингредиент {i}', 'measurement_unit': 'г'}
+            for i in range(100)
+        ]
+        with mock.patch(
+            'recipes.management.commands.load_ingredients.JSON_CHUNK_SIZE', 16
+        ):
+            self.load('ingredients.json', json.dumps(items, indent=2))
+        self.assertEqual(Ingredient.objects.count(), len(items))
+
+    def test_malformed_rows_raise_command_error(self):
+        for name, content in (
+            ('ingredients.csv', 'соль,г\nперец\n'),
+            ('ingredients.json', '[{"name": "соль"}]'),
+            ('ingredients.json', '[{"name": "соль", "measurement_unit": "г"}'),
+            ('ingredients.ndjson', '{"name": "соль"\n'),
+        ):
+            with self.subTest(name=name, content=content):
+                with self.assertRaises(CommandError):
+                    self.load(name, content)
+        self.assertFalse(Ingredient.objects.exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 есть только в SQLite')
+class SQLiteSearchTests(TestCase):
+
+    def test_lost_triggers_are_restored(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='password'
+        )
+        with connection.cursor() as cursor:
+            for action in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER {FTS_TABLE}_{action}')
+        restore_search(connection)
+        recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Свекла и капуста',
+            cooking_time=60, image='recipes/test.png'
+        )
+        self.assertEqual(
+            list(search_recipes(Recipe.objects.all(), 'капуста')), [recipe]
+        )
+
+
+def postgresql_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from postgresql_nodes(child)
+
+
+def postgresql_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(postgresql_nodes(plan[0]['Plan']))
+    problems = [
+        f"{node['Node Type']} {node.get('Relation Name', '')}".strip()
+        for node in nodes if node['Node Type'] in ('Seq Scan', 'Sort')
+    ]
+    used = [
+        node['Index Name'] for node in nodes
+        if node['Node Type'] in POSTGRESQL_INDEX_NODES
+    ]
+    return problems, used
+
+
+def sqlite_plan(queryset):
+    lines = [
+        line.split(' ', 3)[-1] for line in queryset.explain().splitlines()
+    ]
+    problems = [
+        line for line in lines
+        if line.startswith('USE TEMP B-TREE')
+        or line.startswith('SCAN') and 'INDEX' not in line
+    ]
+    used = [
+        line.split(' INDEX ')[1].split(' ')[0]
+        for line in lines if ' INDEX ' in line
+    ]
+    return problems, used
+
+
+PLANS = {
+    'postgresql': postgresql_plan,
+    'sqlite': sqlite_plan,
+}
+
+
+@skipUnless(connection.vendor in PLANS, 'EXPLAIN не поддерживается')
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for i in range(5)
+        ]
+        cls.user, cls.author = users[:2]
+        now = timezone.now()
+        recipes = [
+            Recipe.objects.create(
+                author=users[i % len(users)], name=f'Рецепт {i}',
+                text='Текст', cooking_time=5, image='recipes/test.png'
+            )
+            for i in range(20)
+        ]
+        cls.recipe = recipes[0]
+        for user in users[1:]:
+            Follow.objects.create(user=cls.user, author=user)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        Shopping.objects.create(user=cls.user, recipe=cls.recipe)
+        FeedItem.objects.bulk_create(
+            FeedItem(
+                user=cls.user, recipe=recipe,
+                created_at=now - timedelta(minutes=i)
+            )
+            for i, recipe in enumerate(recipes)
+        )
+
+    def hot_queries(self):
+        return {
+            'favorite_lookup': Favorite.objects.filter(
+                user=self.user, recipe=self.recipe
+            ),
+            'shopping_lookup': Shopping.objects.filter(
+                user=self.user, recipe=self.recipe
+            ),
+            'author_followers': Follow.objects.filter(
+                author=self.author
+            ).values_list('user_id', flat=True),
+            'author_latest_recipes': Recipe.objects.filter(
+                author=self.author
+            ).order_by('-created_at', '-id')[:3],
+            'recipe_list_page': Recipe.objects.with_user_flags(
+                self.user
+            ).order_by('-created_at', '-id')[:6],
+            'feed_page': FeedItem.objects.filter(
+                user=self.user
+            ).order_by('-created_at', '-id')[:6],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        plan = PLANS[connection.vendor]
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                problems, used = plan(queryset)
+                self.assertEqual(problems, [])
+                self.assertTrue(used)
@@ -0,0 +1,47 @@
+import time
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Version
+
+
+def get_versions(*names):
+    versions = dict(
+        Version.objects.filter(name__in=names).values_list('name', 'value')
+    )
+    missing = [name for name in names if name not in versions]
+    if missing:
+        now = time.time_ns()
+        Version.objects.bulk_create(
+            [Version(name=name, value=now) for name in missing],
+            ignore_conflicts=True
+        )
+        versions.update(
+            Version.objects.filter(
+                name__in=missing
+            ).values_list('name', 'value')
+        )
+    return {name: str(versions[name]) for name in names}
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def save_versions(names):
+    now = time.time_ns()
+    updated = Version.objects.filter(name__in=names).update(
+        value=Greatest(F('value') + 1, Value(now))
+    )
+    if updated < len(names):
+        Version.objects.bulk_create(
+            [Version(name=name, value=now) for name in names],
+            ignore_conflicts=True
+        )
+
+
+def bump_version(*names):
+    names = set(names)
+    transaction.on_commit(lambda: save_versions(names))
@@ -18,6 +18,8 @@ class UserAdmin(admin.ModelAdmin):
         'is_active',
         'is_staff',
         'last_login',
+        'recipes_count',
+        'followers_count',
     )
     list_editable = ('is_active',)
     list_filter = ('is_active',)
@@ -36,7 +38,8 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'cooking_time',
-        'author'
+        'author',
+        'favorites_count',
     )
     fieldsets = [
         (None, {'fields': (
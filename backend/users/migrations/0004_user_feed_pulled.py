@@ -0,0 +1,28 @@
+# Generated by Django 3.2.13 on 2026-10-18 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled_feeds(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+        ('recipes', '0007_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лента собирается при чтении'),
+        ),
+        migrations.RunPython(mark_pulled_feeds, migrations.RunPython.noop),
+    ]
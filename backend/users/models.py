@@ -2,7 +2,24 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CountersModelMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersModelMixin, AbstractUser):
 
     first_name = models.CharField('Имя', max_length=150)
     last_name = models.CharField('Фамилия', max_length=150)
@@ -13,6 +30,23 @@ class User(AbstractUser):
         max_length=254
     )
     password = models.CharField('Пароль', max_length=150)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    feed_pulled = models.BooleanField(
+        'Лента собирается при чтении',
+        default=False,
+        editable=False
+    )
+    counter_fields = ('recipes_count', 'followers_count', 'feed_pulled')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
@@ -1,4 +1,5 @@
-from api.views import UserSubscriptionListView, UserViewSet, subscribe
+from api.views import (UserSubscriptionListView, UserViewSet, subscribe,
+                       subscribe_batch)
 from django.urls import include, path
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import routers
@@ -7,6 +8,7 @@ router = routers.DefaultRouter()
 router.register('users', UserViewSet, basename='users')
 urlpatterns = [
     path('users/<int:user_id>/subscribe/', subscribe, name='subscribe'),
+    path('users/subscribe/', subscribe_batch, name='subscribe_batch'),
     path(
         'users/subscriptions/',
         UserSubscriptionListView.as_view(),